@@ -7,7 +7,6 @@ from scipy.stats import shapiro
 
 from sklearn.tree import DecisionTreeClassifier # Import Decision Tree Classifier
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.ensemble import AdaBoostClassifier
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.svm import SVC
 from sklearn.neighbors import KNeighborsClassifier
@@ -20,7 +19,6 @@ import sklearn.metrics as metrics #Import scikit-learn metrics module for accura
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import accuracy_score
 from sklearn.metrics.classification import cohen_kappa_score
-from statistics import mode
 from sklearn.metrics import classification_report
 from sklearn.metrics import confusion_matrix
 from sklearn.ensemble import RandomForestClassifier
@@ -53,133 +51,33 @@ from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 from matplotlib.figure import Figure
 
+# Project modules
+import boosting
+import compact
+import etl
+import history
+import model_zoo
+import preprocessing
+import registry
+import search
+import voting
+
 #set seed
 seed = 100
 
-# reading csv file data
-movie_data_orig = pd.read_csv('movies_metadata.csv')
-# reading csv file data
-movie_data_orig = pd.read_csv('movies_metadata.csv')
-
-
-# removing 10 irrelevant columns
-df_cleaned = movie_data_orig.drop(["adult", "belongs_to_collection", "homepage", "original_title", "overview", "poster_path", "production_countries",
-                                   "spoken_languages", "status", "tagline", "video" ], axis=1)
-
-# print(df_cleaned.columns)   #  'budget', 'genres', 'id', 'imdb_id' 'popularity', 'production_companies', 'release_date', 'revenue', 'runtime', 'title', 'vote_average', 'vote_count']
-#df_cleaned.dtypes       # release_date is of object (i.e. string data type) instead of datetime
-
-# budget column contains alpha-numeric characters, so need to fix it
-df_cleaned['budget'] = df_cleaned['budget'].str.extract('(\d+)', expand=False)   # removing all non-numeric values from budget column
-# changing budget column from object to float
-df_cleaned["budget"] = df_cleaned["budget"].astype(float).fillna(0.0)
-df_cleaned = df_cleaned.loc[(df_cleaned['budget'] > 100000) & (df_cleaned['revenue'] > 1000)]   # subsetting df to only movies with budget greater than $100,000 & revenue greater than $1000
-# df_cleaned = df_cleaned.loc[]      # subsetting df to only movies with
-
-# creating our target/label column showing status i.e success/flop movie.
-df_cleaned["status"] = df_cleaned["revenue"]/df_cleaned["budget"]
-# Our criteria for success is any value greater than 1 else flop
-df_cleaned["New_status"] = np.nan      # creating a new empty target column called New_Status
-df_cleaned["New_status"] = df_cleaned["New_status"].mask( df_cleaned["status"] > 1, 1)
-df_cleaned["New_status"] = df_cleaned["New_status"].mask( df_cleaned["status"] <= 1, 0)
-df_cleaned["New_status"] = df_cleaned["New_status"].astype("category")      # converting from float to categorical datatye
-
-# there are many entries where the number of people who voted for a movie are 1, 2 , 3 etc. They need to be removed otherwise it will create bias
-df_cleaned = df_cleaned.loc[(df_cleaned['vote_count'] > 100) & df_cleaned["vote_average"] > 0]      # subsetting df to only movies where atleast 100 people voted for a movie & vote_average > 0
-
-# rearranging columns of dataframe
-cols = df_cleaned.columns.tolist()
-# Setting Genre as last col for easier manipulation
-cols = ['budget', 'id', 'imdb_id', 'popularity', 'original_language', 'production_companies', 'release_date', 'revenue', 'runtime', 'title', 'vote_average', 'vote_count', 'status', 'New_status', 'genres']
-df_cleaned = df_cleaned[cols]
-
-# converting (genre) json column to normal string column
-# Replacing null values with '{}'
-df_cleaned['genres'] = df_cleaned['genres'].replace(np.nan,'{}',regex = True)
-df_cleaned['genres'] = pd.DataFrame(df_cleaned['genres'].apply(eval))
-# dividing all genres in a cell into separate cols/series, concating it to main df & then dropping the original "genres" column from df
-df_cleaned = pd.concat([df_cleaned.drop(['genres'], axis=1), df_cleaned['genres'].apply(pd.Series)], axis=1)
-# Removing all columns except the major genre type for each movie
-df_cleaned.drop(df_cleaned.iloc[:, 15:], inplace = True, axis = 1)
-# creating separate series for "id" & "name" and concating it to main df
-df_cleaned = pd.concat([df_cleaned.drop([0], axis=1), df_cleaned[0].apply(pd.Series)], axis=1)
-df_cleaned.drop(df_cleaned.iloc[:, 14:16], inplace = True, axis = 1)     # dropping extraneous cols
-df_cleaned.rename(columns = {'name' : 'Genre'}, inplace = True)   # renaming col
-df_cleaned = df_cleaned[~df_cleaned['Genre'].isnull()] # removing null containing rows
-
-
-
-# rearranging columns of dataframe
-cols = df_cleaned.columns.tolist()
-# Setting Production_companies as last col for easier manipulation
-cols = ['budget', 'imdb_id', 'popularity', 'original_language', 'release_date', 'revenue', 'runtime', 'title', 'vote_average', 'vote_count', 'status', 'New_status', 'Genre', 'production_companies']
-df_cleaned = df_cleaned[cols]
-
-# converting (production_companies) json column to normal string column
-# Replacing null values with '{}'
-df_cleaned['production_companies'] = df_cleaned['production_companies'].replace(np.nan,'{}',regex = True)
-# Converting Strings to Dictionaries as it have multiple production companies in json format
-df_cleaned['production_companies'] = pd.DataFrame(df_cleaned['production_companies'].apply(eval))
-# Dividing all production companies into separate cols, concatenating these to the main df and dropping the original 'production companies' col
-df_cleaned = pd.concat([df_cleaned.drop(['production_companies'], axis=1), df_cleaned['production_companies'].apply(pd.Series)], axis=1)
-# Removing all production companies cols except major production company
-df_cleaned.drop(df_cleaned.iloc[:, 14:], inplace = True, axis = 1)
-# creating separate series for "name" & "id" and concating it to main df
-df_cleaned = pd.concat([df_cleaned.drop([0], axis=1), df_cleaned[0].apply(pd.Series)], axis=1)
-# dropping unnecessary cols
-df_cleaned.drop(df_cleaned.iloc[:, 13:15], inplace = True, axis = 1)
-# renaming newly created col
-df_cleaned.rename(columns = {'name' : 'Production_Company'}, inplace = True)
-df_cleaned = df_cleaned[~df_cleaned['Production_Company'].isnull()]
-len(df_cleaned.Production_Company.unique())
-
-
-# Adding Director col using imdb files
-dir_id_imdb = pd.read_csv('title_crew.tsv', sep='\t')
-merged_inner = pd.merge(left=df_cleaned,right=dir_id_imdb, left_on='imdb_id', right_on='tconst')
-dir_name_imdb = pd.read_csv('name_basics.tsv', sep='\t')
-merged_inner = pd.merge(left=merged_inner,right=dir_name_imdb, left_on='directors', right_on='nconst')
-merged_inner = merged_inner.drop(["tconst", "directors", "nconst"], axis=1)     # removing irrelevant cols
-merged_inner.rename(columns = {'primaryName' : 'Director'}, inplace = True)
-
-
-# Adding Avg_ratings & Total votes cols using imdb files
-ratings_imdb = pd.read_csv('title_ratings.tsv', sep='\t')
-merged_inner = pd.merge(left=merged_inner,right=ratings_imdb, left_on='imdb_id', right_on='tconst')
-merged_inner = merged_inner.drop(["tconst", "vote_average", "vote_count"], axis=1)     # removing old vote_avg/count cols
-
-# Adding Movie release year column from imdb file
-releaseYr_imdb = pd.read_csv('title_year.tsv', sep='\t')
-merged_inner = pd.merge(left=merged_inner,right=releaseYr_imdb, left_on='imdb_id', right_on='tconst')
-merged_inner = merged_inner.drop(["tconst"], axis=1)
-cols = merged_inner.columns.tolist()
-
-#Extracting Month from release date
-merged_inner['release_date_temp'] = pd.to_datetime(merged_inner['release_date'],format='%Y-%m-%d', errors='coerce')  #Converting string to datetime
-merged_inner['release_month'] = pd.to_datetime(merged_inner['release_date_temp']).dt.month #extracting month from datetime(Releasedate) column
-#df_cleaned['release_month'] = pd.to_numeric(df_cleaned['release_month'],errors='coerce') #converting float to int
-merged_inner['release_month'] = merged_inner['release_month'].astype('category')
-merged_inner = merged_inner.drop(['release_date_temp'], axis=1)
-
-# Setting StartYear col beside release_date col
-cols = ['budget', 'imdb_id', 'popularity', 'release_date', 'startYear', 'release_month', 'revenue', 'runtime', 'title', 'Genre', 'Production_Company', 'Director', 'averageRating', 'numVotes', 'original_language','status', 'New_status',]
-merged_inner = merged_inner[cols]
-merged_inner["startYear"].min()
-
-len(merged_inner.Director.unique())     # 1173
+# reading and cleaning movies_metadata.csv and the IMDb files (see etl.py)
+# the cleaned frame is cached in cache/, the ETL only reruns when a source file or a cleaning parameter changes,
+# and then only for the movies that were added or changed in the new snapshot
+merged_inner = etl.load_merged_inner(incremental=True)
+# smallest safe numeric widths, categoricals and Arrow strings for the text columns (see compact.py)
+merged_inner = compact.compact_frame(merged_inner)
 
+len(merged_inner.Director.unique())     # directors, with those of the co-directed movies (see directors.py)
+len(merged_inner)    # movies, tt0270288 is listed twice in movies_metadata and kept once (see dedup.py)
 
 # finding missing values
 # a = merged_inner.isnull().sum()           # returns 0 for each column meaning no missing values
 
-merged_inner.dtypes       # release_date is of object (i.e. string data type) instead of datetime
-merged_inner['release_date'] =  pd.to_datetime(merged_inner['release_date'])    # converting release_date to datetime object
-merged_inner['startYear'] = merged_inner['startYear'].astype(str).astype(int)     # converting startYear to int instead of object
-
-len(merged_inner)    # 2222
-
-# Removing Duplicates
-merged_inner.drop_duplicates(inplace = True)     # no duplicates btw
 #
 # merged_inner.to_csv(r"Cleaned_df.csv", index=None, header=True)
 
@@ -341,191 +239,106 @@ plt.show()
 # Spliting and encoding data
 # split the dataset into input and target variables
 print("original data : ", len(merged_inner))
-X = merged_inner.loc[:,['runtime','averageRating','budget','Genre','Production_Company','release_month', 'popularity']]  #
+# films and success rate of the director and of the company before each release, overall and over the last 5 years
+merged_inner = history.add_history_features(merged_inner)
+X = merged_inner.loc[:, preprocessing.FEATURES]
 y = merged_inner.loc[:,['New_status']]
 
-scaler = MinMaxScaler()
-X.loc[:,['runtime','averageRating','budget', 'popularity']]= scaler.fit_transform(X.loc[:,['runtime','averageRating','budget', 'popularity']])
-
-# encloding the class with sklearn's LabelEncoder
-le = LabelEncoder()
-# fit and transform the class
-y = le.fit_transform(y)
-X = pd.get_dummies(X)
-
-
 # split the dataset into train and test
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=seed, stratify=y)
+train_rows, test_rows = train_test_split(np.arange(len(merged_inner)), test_size=0.3, random_state=seed, stratify=y)
 #print("X train: ", len(X_train))
 
+# MinMax scaling, out-of-fold target encoding of Production_Company and Director, sparse one-hot encoding of Genre and
+# release_month and the LabelEncoder of the class, fitted on the training rows and saved with the registered models
+# for scoring new data (see preprocessing.py and registry.py); encoding='hashing' hashes companies, directors and languages into a fixed width instead
+pipeline, X_train = preprocessing.fit_pipeline(merged_inner.iloc[train_rows], encoding=preprocessing.ENCODING)
+X_test = pipeline.transform(X.iloc[test_rows])
+y_train = pipeline.transform_target(y.iloc[train_rows])
+y_test = pipeline.transform_target(y.iloc[test_rows])
+
+# histogram boosting is fitted on the rows before oversampling, with balanced class weights (see boosting.py)
+X_train_native, categorical = boosting.native_matrix(pipeline, X_train)
+X_test_native, _ = boosting.native_matrix(pipeline, X_test)
+y_train_native = y_train
+
 # Over sampling
 # RandomOverSampler (with random_state=0)
 ros = RandomOverSampler(random_state=0)
 X_train, y_train = ros.fit_sample(X_train, y_train)
-print("after over sam X : ", len(X_train))
+print("after over sam X : ", X_train.shape[0])
 print("after over sam y : ", len(y_train))
 
-# Decision Tree Gini
-# perform training with giniIndex.
-# creating the classifier object
-clf_gini = DecisionTreeClassifier(criterion="gini", random_state=seed, min_samples_leaf=5)
-
-# performing training
-clf_gini.fit(X_train, y_train)
-
-# predicton on test using gini
-y_pred_gini = clf_gini.predict(X_test)
-
-print("Classification Report For DT Gini: ")
-print(classification_report(y_test,y_pred_gini))
-print("Accuracy : ", accuracy_score(y_test, y_pred_gini.ravel()) * 100)
-
-#Decision Tree Entropy
-# perform training with Entropy.
-# creating the classifier object
-clf_entropy = DecisionTreeClassifier(criterion="entropy", random_state=seed, min_samples_leaf=5)
-
-# performing training
-clf_entropy.fit(X_train, y_train)
-
-# predicton on test using gini
-y_pred_entropy = clf_entropy.predict(X_test)
-
-print("Classification Report for DT Entropy: ")
-print(classification_report(y_test,y_pred_entropy.ravel()))
-print("Accuracy : ", accuracy_score(y_test, y_pred_entropy) * 100)
-
-
-#Random Forest
-# specify random forest classifier
-clf_rf = RandomForestClassifier(n_estimators=100,random_state=seed)
-
-# perform training
-clf_rf.fit(X_train, y_train)
-
-# predicton on test using all features
-y_pred_rf = clf_rf.predict(X_test)
-y_pred_score = clf_rf.predict_proba(X_test)
-
-print("Classification Report for DT Entropy: ")
-print(classification_report(y_test,y_pred_rf))
-print("Accuracy : ", accuracy_score(y_test, y_pred_rf) * 100)
-
-#Applying SVM Classification
-# perform training
-# creating the classifier object
-clf = SVC(kernel="linear")
-
-# performing training
-clf.fit(X_train, y_train)
-
-# predicton on test
-y_pred_svm = clf.predict(X_test)
-
-# calculate metrics
-print("\n")
-
-print("Classification Report for SVM:")
-print(classification_report(y_test,y_pred_svm))
-print("\n")
-
-print("Accuracy : ", accuracy_score(y_test, y_pred_svm) * 100)
-print("\n")
-
-#KNN
-# standardize the data
-stdsc = StandardScaler()
-
-stdsc.fit(X_train)
-
-X_train_std = stdsc.transform(X_train)
-X_test_std = stdsc.transform(X_test)
-
-# perform training
-# creating the classifier object
-clf_knn = KNeighborsClassifier(n_neighbors=3)
-
-# performing training
-clf_knn.fit(X_train_std, y_train)
-
-#%%-----------------------------------------------------------------------
-# make predictions
-
-# predicton on test
-y_pred_knn = clf.predict(X_test_std)
-
-#%%-----------------------------------------------------------------------
-# calculate metrics
-
-print("\n")
-print("Classification Report for KNN: ")
-print(classification_report(y_test,y_pred_knn))
-print("\n")
-
-
-print("Accuracy : ", accuracy_score(y_test, y_pred_knn) * 100)
-print("\n")
-
-#Naive Bayese
-# creating the classifier object
-clf_nb = GaussianNB()
-
-# performing training
-clf_nb.fit(X_train, y_train)
-
-#%%-----------------------------------------------------------------------
-# make predictions
-
-# predicton on test
-y_pred_nb = clf_nb.predict(X_test)
-
-#%%-----------------------------------------------------------------------
-# calculate metrics
-
-print("\n")
-
-print("Classification Report for NB: ")
-print(classification_report(y_test,y_pred_nb))
-print("\n")
-
-print("Accuracy : ", accuracy_score(y_test, y_pred_nb) * 100)
-print("\n")
+# The models are fitted in parallel processes sharing the training matrix (see model_zoo.py)
+# with the parameters found by python search.py when it has been run, the defaults below otherwise
+best_params = search.load_best_params()
+model_specs = [
+    # Decision Tree Gini / Entropy
+    model_zoo.spec('DT Gini', search.tuned('DT Gini', DecisionTreeClassifier(criterion="gini", random_state=seed, min_samples_leaf=5), best_params)),
+    model_zoo.spec('DT Entropy', search.tuned('DT Entropy', DecisionTreeClassifier(criterion="entropy", random_state=seed, min_samples_leaf=5), best_params)),
+    # Random Forest
+    model_zoo.spec('RF', search.tuned('RF', RandomForestClassifier(n_estimators=100, random_state=seed), best_params)),
+    # SVM Classification
+    model_zoo.spec('SVM', search.tuned('SVM', SVC(kernel="linear"), best_params)),
+    # KNN on the standardized data
+    model_zoo.spec('KNN', search.tuned('KNN', KNeighborsClassifier(n_neighbors=3), best_params), matrix='standardized'),
+    # Naive Bayes, needs a dense matrix
+    model_zoo.spec('NB', GaussianNB(), matrix='dense'),
+]
+# Boosting: histogram gradient boosting with Genre and release_month as native categoricals and early stopping,
+# or the original AdaBoost over random forests (see boosting.py)
+if boosting.BOOSTING == 'hgb':
+    boost_name, X_test_boost = 'HGB', X_test_native
+    model_specs.append(model_zoo.spec(boost_name, search.tuned('HGB', boosting.hist_gradient_boosting(categorical, random_state=seed), best_params), matrix='native'))
+else:
+    boost_name, X_test_boost = 'ADA', X_test
+    model_specs.append(model_zoo.spec(boost_name, boosting.adaboost(random_state=seed)))
+results, models, predictions = model_zoo.run_zoo(model_specs, X_train, y_train, X_test, y_test,
+                                                 native=(X_train_native, X_test_native), native_target=y_train_native)
+
+# every fitted model is saved to the local registry with its pipeline, parameters, metrics and the hash of its
+# training data, for batch scoring and other tools to load without refitting (see registry.py); rerunning on
+# the same data replaces the entries of the previous run
+for model in model_specs:
+    X_fit, y_fit = (X_train_native, y_train_native) if model['matrix'] == 'native' else (X_train, y_train)
+    registry.register(model['name'], models[model['name']], pipeline, X_fit, y_fit, merged_inner,
+                      matrix=model['matrix'], metrics=results.loc[model['name']])
+
+for name in results.index:
+    print("Classification Report for %s: " % name)
+    print(classification_report(y_test, predictions[name]))
+    print("Accuracy : ", results.loc[name, 'accuracy'] * 100)
+    print("\n")
+
+y_pred_gini = predictions['DT Gini']
+y_pred_entropy = predictions['DT Entropy']
+y_pred_rf = predictions['RF']
+y_pred_svm = predictions['SVM']
+y_pred_boost = predictions[boost_name]
+clf_rf = models['RF']
+classifier = models[boost_name]
 
 #Ensembling
-final_pred = np.array([])
-for i in range(0,len(X_test)):
-    final_pred = np.append(final_pred, mode([y_pred_rf[i], y_pred_svm[i], y_pred_entropy[i]]))
-
-#Applying ADA Boosting
-classifier = AdaBoostClassifier(RandomForestClassifier(n_estimators=100,random_state=seed),n_estimators=100,random_state=seed)
-classifier.fit(X_train, y_train)
-
-# predicton on test using all features
-y_pred_boost = classifier.predict(X_test)
-
-print("Classification Report for boosting: ")
-print(classification_report(y_test,y_pred_boost))
-print("Accuracy : ", accuracy_score(y_test, y_pred_boost) * 100)
-
+# majority vote and mean probability of the fitted RF, SVM and entropy tree, nothing is refitted (see voting.py)
+ensemble_members = [models['RF'], models['SVM'], models['DT Entropy']]
+for voting_method in voting.VOTING:
+    ensemble = voting.VotingEnsemble(ensemble_members, voting=voting_method)
+    ensemble_proba = ensemble.predict_proba(X_test)
+    final_pred = ensemble.classes_[ensemble_proba.argmax(axis=1)]
+    results.loc['%s voting (RF, SVM, DT Entropy)' % voting_method.capitalize()] = model_zoo.metrics_row(y_test, final_pred, ensemble_proba[:, 1])
 
 
 print("*"*50)
-print("Accuracy DT Gini : ", accuracy_score(y_test, y_pred_gini) * 100)
-print("Accuracy DT Entropy: ", accuracy_score(y_test, y_pred_entropy) * 100)
-print("Accuracy SVM: ", accuracy_score(y_test, y_pred_svm) * 100)
-print("Accuracy RF: ", accuracy_score(y_test, y_pred_rf) * 100)
-print("Accuracy KNN: ", accuracy_score(y_test, y_pred_knn) * 100)
-print("Accuracy NB: ", accuracy_score(y_test, y_pred_nb) * 100)
-print("Accuracy Bagging with Mode method: ", accuracy_score(y_test, final_pred) * 100)
-print("Accuracy ADA: ", accuracy_score(y_test, y_pred_boost) * 100)
+for name in results.index:
+    print("Accuracy %s: " % name, results.loc[name, 'accuracy'] * 100)
 print("*"*50)
+print(results.round(4).to_string())
 
 #Printing results for our best model
 print("ROC_AUC : ", roc_auc_score(y_test, y_pred_boost) * 100)
 print("Accuracy K: ", cohen_kappa_score(y_test, y_pred_boost)* 100)
 
 # ROC Graph
-y_pred_score = classifier.predict_proba(X_test)
+y_pred_score = classifier.predict_proba(X_test_boost)
 preds = y_pred_score[:,1]
 fpr, tpr, threshold = metrics.roc_curve(y_test, preds)
 roc_auc = metrics.auc(fpr, tpr)
@@ -567,7 +380,7 @@ plt.show()
 #
 
 merged_inner.to_csv("GUI_df.csv")
-gui_df = pd.read_csv("GUI_df.csv")
+gui_df = compact.compact_frame(pd.read_csv("GUI_df.csv"), verbose=False)
 
 font_size_window = 'font-size:15px'
 
@@ -636,7 +449,9 @@ class DecisionTree(QMainWindow):
 
         self.lblMaxDepth = QLabel('Maximun Depth :')
         self.txtMaxDepth = QLineEdit(self)
-        self.txtMaxDepth.setText("3")
+        # depth found by python search.py, if any; empty means no limit
+        best_depth = gui_best_params.get('DT Entropy', {}).get('max_depth', 3)
+        self.txtMaxDepth.setText("" if best_depth is None else str(best_depth))
 
         self.btnExecute = QPushButton("Execute DT")
         self.btnExecute.clicked.connect(self.update)
@@ -760,48 +575,8 @@ class DecisionTree(QMainWindow):
         '''
 
         # We process the parameters
-        self.list_dt = pd.DataFrame([])
-        if self.feature0.isChecked():
-            if len(self.list_dt)==0:
-                self.list_dt = gui_df[dt_features[0]]
-            else:
-                self.list_dt = pd.concat([self.list_dt, gui_df[dt_features[0]]],axis=1)
-
-        if self.feature1.isChecked():
-            if len(self.list_dt) == 0:
-                self.list_dt = gui_df[features_list[1]]
-            else:
-                self.list_dt = pd.concat([self.list_dt, gui_df[dt_features[1]]],axis=1)
-
-        if self.feature2.isChecked():
-            if len(self.list_dt) == 0:
-                self.list_dt = gui_df[dt_features[2]]
-            else:
-                self.list_dt = pd.concat([self.list_dt, gui_df[dt_features[2]]],axis=1)
-
-        if self.feature3.isChecked():
-            if len(self.list_dt) == 0:
-                self.list_dt = gui_df[dt_features[3]]
-            else:
-                self.list_dt = pd.concat([self.list_dt, gui_df[dt_features[3]]],axis=1)
-
-        if self.feature4.isChecked():
-            if len(self.list_dt) == 0:
-                self.list_dt = gui_df[dt_features[4]]
-            else:
-                self.list_dt = pd.concat([self.list_dt, gui_df[dt_features[4]]],axis=1)
-
-        if self.feature5.isChecked():
-            if len(self.list_dt) == 0:
-                self.list_dt = gui_df[dt_features[5]]
-            else:
-                self.list_dt = pd.concat([self.list_dt, gui_df[dt_features[5]]],axis=1)
-
-        if self.feature6.isChecked():
-            if len(self.list_dt) == 0:
-                self.list_dt = gui_df[dt_features[6]]
-            else:
-                self.list_dt = pd.concat([self.list_dt, gui_df[dt_features[6]]],axis=1)
+        checked = [self.feature0, self.feature1, self.feature2, self.feature3, self.feature4, self.feature5, self.feature6]
+        self.list_dt = [feature for feature, box in zip(dt_features, checked) if box.isChecked()]
 
         # if self.feature7.isChecked():
         #     if len(self.list_corr_features) == 0:
@@ -811,7 +586,8 @@ class DecisionTree(QMainWindow):
 
 
         vtest_per = float(self.txtPercentTest.text())
-        vmax_depth = float(self.txtMaxDepth.text())
+        # empty (or None) for a tree without depth limit
+        vmax_depth = None if self.txtMaxDepth.text().strip() in ('', 'None') else int(self.txtMaxDepth.text())
 
         self.ax1.clear()
         self.ax2.clear()
@@ -825,28 +601,27 @@ class DecisionTree(QMainWindow):
 
 
 
-        X_dt =  self.list_dt
-        y_dt = gui_df['New_status']
-
-        scaler = MinMaxScaler()
-        X_dt.loc[:,['runtime','averageRating','budget', 'popularity']]= scaler.fit_transform(X_dt.loc[:,['runtime','averageRating','budget', 'popularity']])
-
-        class_le = LabelEncoder()
-
-        # fit and transform the class
-
-
-        y_dt = class_le.fit_transform(y_dt)
-        X_dt = pd.get_dummies(X_dt)
-
-
-
         # split the dataset into train and test
-        X_train, X_test, y_train, y_test = train_test_split(X_dt, y_dt, test_size=vtest_per, random_state=100, stratify=y_dt)
+        train_rows, test_rows = train_test_split(np.arange(len(gui_df)), test_size=vtest_per, random_state=100,
+                                                 stratify=gui_df[preprocessing.TARGET])
+
+        # preprocessing fitted on the training rows only: the success rates of the directors and companies
+        # (target encoding, see preprocessing.py) must not have seen the labels of the test rows
+        self.pipeline = preprocessing.make_pipeline()
+        X_train = self.pipeline.fit_transform(gui_df.iloc[train_rows][preprocessing.FEATURES],
+                                              gui_df.iloc[train_rows][preprocessing.TARGET])
+        X_test = self.pipeline.transform(gui_df.iloc[test_rows][preprocessing.FEATURES])
+        y_train = self.pipeline.transform_target(gui_df.iloc[train_rows][preprocessing.TARGET])
+        y_test = self.pipeline.transform_target(gui_df.iloc[test_rows][preprocessing.TARGET])
+
+        # columns of the checked features
+        columns = self.pipeline.feature_columns(self.list_dt)
+        X_train, X_test = X_train[:, columns], X_test[:, columns]
 
         # perform training with entropy.
         # Decision tree with entropy
-        self.clf_entropy = DecisionTreeClassifier(criterion="entropy", random_state=100, max_depth=vmax_depth, min_samples_leaf=5)
+        self.clf_entropy = DecisionTreeClassifier(criterion="entropy", random_state=100, max_depth=vmax_depth,
+                                                  min_samples_leaf=gui_best_params.get('DT Entropy', {}).get('min_samples_leaf', 5))
 
 
         # Performing training
@@ -962,7 +737,8 @@ class DecisionTree(QMainWindow):
         :return:None
         '''
         dot_data = export_graphviz(self.clf_entropy, filled=True, rounded=True, class_names=class_names,
-                                   feature_names=self.list_dt.columns, out_file=None)
+                                   feature_names=self.pipeline.get_feature_names_out()[self.pipeline.feature_columns(self.list_dt)],
+                                   out_file=None)
 
 
         graph = graph_from_dot_data(dot_data)
@@ -1318,8 +1094,13 @@ def movie_prediction():
     global features_list
     global class_names
     global dt_features
+    global gui_best_params
 
-    gui_df = pd.read_csv('GUI_df.csv')
+    gui_df = compact.compact_frame(pd.read_csv('GUI_df.csv'), verbose=False)
+    if not set(history.FEATURE_COLUMNS) <= set(gui_df.columns):
+        gui_df = history.add_history_features(gui_df)
+    # parameters saved by python search.py, empty before the first search
+    gui_best_params = search.load_best_params()
     features_list = ['budget', 'startYear', 'revenue', 'runtime', 'popularity', 'averageRating', 'numVotes','status']
     class_names = ['0', '1']
 
@@ -0,0 +1,64 @@
+import time
+
+import pandas as pd
+from imblearn.over_sampling import RandomOverSampler
+from sklearn.model_selection import train_test_split
+
+import boosting
+import dates
+import history
+import model_zoo
+import preprocessing
+
+#::------------------------------------------------------------------------
+# Benchmark of the boosting models on Cleaned_df.csv
+#       python benchmark_boosting.py
+# Same split and training rows as Project_Code.py (30% test, stratified,
+# seed 100): AdaBoost on the oversampled rows, histogram boosting on the
+# rows before oversampling with balanced class weights. The models are
+# fitted one after the other so that each gets every core. Cleaned_df.csv
+# has no json list columns, so the preprocessing runs without multi-hot
+# encoding.
+#::------------------------------------------------------------------------
+
+DATA_FILE = 'Cleaned_df.csv'
+SEED = 100
+
+
+def load_data(path=DATA_FILE):
+    df = pd.read_csv(path)
+    df = dates.add_date_features(df)
+    return history.add_history_features(df)
+
+
+def run_benchmark(df, seed=SEED):
+    '''
+    Fits AdaBoost over random forests and histogram gradient boosting on the same split
+    :return: results table of model_zoo.run_zoo, with the number of boosting rounds
+    '''
+    y = df[preprocessing.TARGET]
+    train, test = train_test_split(df, test_size=0.3, random_state=seed, stratify=y)
+
+    start = time.time()
+    pipeline = preprocessing.MoviePreprocessor(multi_hot=[])
+    X_train = pipeline.fit_transform(train, train[preprocessing.TARGET])
+    X_test = pipeline.transform(test)
+    y_train = pipeline.transform_target(train[preprocessing.TARGET])
+    y_test = pipeline.transform_target(test[preprocessing.TARGET])
+    X_train_native, categorical = boosting.native_matrix(pipeline, X_train)
+    X_test_native, _ = boosting.native_matrix(pipeline, X_test)
+    y_train_native = y_train
+    X_train, y_train = RandomOverSampler(random_state=0).fit_resample(X_train, y_train)
+    print('preprocessing: %.2fs' % (time.time() - start))
+
+    models = [model_zoo.spec('AdaBoost(RF)', boosting.adaboost(random_state=seed)),
+              model_zoo.spec('HistGradientBoosting', boosting.hist_gradient_boosting(categorical, random_state=seed),
+                             matrix='native')]
+    results, estimators, _ = model_zoo.run_zoo(models, X_train, y_train, X_test, y_test, n_jobs=1,
+                                               native=(X_train_native, X_test_native), native_target=y_train_native)
+    results['rounds'] = [len(estimators['AdaBoost(RF)'].estimators_), estimators['HistGradientBoosting'].n_iter_]
+    return results
+
+
+if __name__ == '__main__':
+    print(run_benchmark(load_data()).round(4).to_string())
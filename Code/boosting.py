@@ -0,0 +1,74 @@
+import numpy as np
+from sklearn.ensemble import AdaBoostClassifier, RandomForestClassifier
+
+try:
+    from sklearn.ensemble import HistGradientBoostingClassifier
+except ImportError:
+    # scikit-learn < 1.0
+    from sklearn.experimental import enable_hist_gradient_boosting  # noqa: F401
+    from sklearn.ensemble import HistGradientBoostingClassifier
+
+#::------------------------------------------------------------------------
+# Boosting model of the project
+# AdaBoost over random forests of 100 trees fits up to 10,000 trees one after
+# the other. Histogram gradient boosting bins every feature once (255 bins),
+# finds the splits on all cores, handles Genre and release_month as native
+# categoricals instead of one-hot columns, and stops adding trees when the
+# validation loss no longer improves. It is fitted on the training rows
+# before oversampling, with balanced class weights: copies of minority rows
+# would land on both sides of its validation split and early stopping would
+# measure the training fit.
+# benchmark_boosting.py compares the two on Cleaned_df.csv.
+#::------------------------------------------------------------------------
+
+# 'hgb' or 'ada', the boosting model of the model zoo
+BOOSTING = 'hgb'
+
+HGB_PARAMS = {
+    'learning_rate': 0.05,
+    'max_iter': 1000,               # upper bound, early stopping picks the number of trees
+    'max_leaf_nodes': 15,
+    'min_samples_leaf': 20,
+    'l2_regularization': 1.0,
+    'early_stopping': True,
+    'validation_fraction': 0.15,
+    'n_iter_no_change': 30,
+    'scoring': 'loss',
+    'class_weight': 'balanced',     # instead of oversampling
+}
+
+
+def native_matrix(pipeline, X):
+    '''
+    Dense matrix for the histogram boosting from the CSR matrix of a
+    preprocessing.MoviePreprocessor: the numeric, target encoded, multi-hot
+    and hashed columns (encoding='hashing' keeps the companies, directors and
+    languages that way), then one code column per one-hot encoded column
+    Working on the CSR matrix (not on the frame) gives the same columns for
+    every matrix of the pipeline: training, test and registry scoring
+    :return: dense array, boolean mask of the categorical columns
+    '''
+    dense = X[:, pipeline.feature_columns(list(pipeline.numeric) + list(pipeline.target_encoded)
+                                          + list(pipeline.multi_hot) + list(pipeline.hashed)
+                                          + list(pipeline.hashed_lists))].toarray()
+    # every row has exactly one 1 in the block of a one-hot column, its position is the level code ('other' last)
+    codes = [np.asarray(X[:, pipeline.feature_columns([col])].argmax(axis=1)).ravel() for col in pipeline.categorical]
+    matrix = np.column_stack([dense] + codes)
+    categorical = np.arange(matrix.shape[1]) >= dense.shape[1]
+    return matrix, categorical
+
+
+def hist_gradient_boosting(categorical, random_state=None, **params):
+    '''
+    :param categorical: boolean mask of the categorical columns, see native_matrix
+    :param params: overrides of HGB_PARAMS
+    :return: unfitted HistGradientBoostingClassifier
+    '''
+    return HistGradientBoostingClassifier(categorical_features=categorical, random_state=random_state,
+                                          **dict(HGB_PARAMS, **params))
+
+
+def adaboost(random_state=None):
+    # the boosting model of the original project
+    return AdaBoostClassifier(RandomForestClassifier(n_estimators=100, random_state=random_state), n_estimators=100,
+                              random_state=random_state)
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+#::------------------------------------------------------------------------
+# Content addressed cache for cleaned data frames
+# A frame is stored under a key made from the sha1 of every source file and
+# the parameters used to build it, so a changed file or parameter gives a new
+# key and the old frame is simply not found. Frames are written as Parquet
+# (columnar, keeps the datetime dtypes) when pyarrow is installed, otherwise
+# as a pickle. Parquet does not keep the category dtype of numeric columns
+# (release_month, New_status) and reads object columns back as strings, so
+# the categories of every category column (values, their dtype and ordered)
+# and the object columns go to a <key>.dtypes.json sidecar and the same
+# dtypes are rebuilt on load.
+#::------------------------------------------------------------------------
+
+CACHE_DIR = 'cache'
+# sha1 of the source files, reused while the size and mtime of a file are unchanged
+FILE_HASHES = 'file_hashes.json'
+
+try:
+    import pyarrow  # noqa: F401
+    FRAME_FORMAT = 'parquet'
+except ImportError:
+    FRAME_FORMAT = 'pkl'
+
+
+def file_hash(path, cache_dir=CACHE_DIR):
+    '''
+    sha1 of the content of path
+    Hashing the multi GB IMDb dumps takes a few seconds, so the digest is
+    remembered in cache_dir and only recomputed when size or mtime change
+    :return: hex digest
+    '''
+    stat = os.stat(path)
+    stamp = [stat.st_size, stat.st_mtime_ns]
+
+    memo_path = os.path.join(cache_dir, FILE_HASHES)
+    memo = {}
+    if os.path.exists(memo_path):
+        with open(memo_path) as f:
+            memo = json.load(f)
+
+    entry = memo.get(os.path.abspath(path))
+    if entry is not None and entry['stamp'] == stamp:
+        return entry['sha1']
+
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(block)
+
+    memo[os.path.abspath(path)] = {'stamp': stamp, 'sha1': sha1.hexdigest()}
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(memo_path, 'w') as f:
+        json.dump(memo, f, indent=1)
+    return sha1.hexdigest()
+
+
+def dataset_key(paths, params, cache_dir=CACHE_DIR, hashes=None):
+    '''
+    Key of a data set built from the files in paths with params
+    :param paths: list of source files
+    :param params: json serializable dict of build parameters
+    :param hashes: sha1 already known of some of the paths, path -> hex digest,
+                   e.g. of a file that is not on disk any more
+    :return: hex digest
+    '''
+    hashes = hashes or {}
+    sha1 = hashlib.sha1()
+    for path in paths:
+        sha1.update(os.path.basename(path).encode())
+        sha1.update((hashes.get(path) or file_hash(path, cache_dir)).encode())
+    sha1.update(json.dumps(params, sort_keys=True).encode())
+    return sha1.hexdigest()
+
+
+def frame_path(key, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, '{}.{}'.format(key, FRAME_FORMAT))
+
+
+def dtypes_path(key, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, '{}.dtypes.json'.format(key))
+
+
+def _categories(dtype):
+    # json description of a CategoricalDtype, the categories keep their own dtype (int months stay int)
+    return {'categories': dtype.categories.tolist(), 'dtype': str(dtype.categories.dtype), 'ordered': bool(dtype.ordered)}
+
+
+def _categorical_dtype(categories):
+    return pd.CategoricalDtype(pd.Index(categories['categories']).astype(categories['dtype']), categories['ordered'])
+
+
+def load_frame(key, cache_dir=CACHE_DIR):
+    '''
+    :return: the cached frame for key, None if there is none
+    '''
+    path = frame_path(key, cache_dir)
+    if not os.path.exists(path):
+        return None
+    if FRAME_FORMAT == 'pkl':
+        return pd.read_pickle(path)
+
+    df = pd.read_parquet(path)
+    # Parquet does not keep the category dtype of numeric columns (release_month, New_status) nor object columns
+    if os.path.exists(dtypes_path(key, cache_dir)):
+        with open(dtypes_path(key, cache_dir)) as f:
+            dtypes = json.load(f)
+        for col, categories in dtypes['category'].items():
+            df[col] = df[col].astype(_categorical_dtype(categories))
+        df[dtypes['object']] = df[dtypes['object']].astype(object)
+    return df
+
+
+def save_frame(df, key, cache_dir=CACHE_DIR):
+    '''
+    Stores df under key
+    :return: path of the written file
+    '''
+    os.makedirs(cache_dir, exist_ok=True)
+    path = frame_path(key, cache_dir)
+    # write to a temporary file first, a half written cache file must never be loaded
+    tmp_path = path + '.tmp'
+    if FRAME_FORMAT == 'parquet':
+        with open(dtypes_path(key, cache_dir), 'w') as f:
+            json.dump({'category': {col: _categories(df[col].dtype) for col in df.select_dtypes('category').columns},
+                       'object': [col for col in df if df[col].dtype == object]}, f, default=str)
+        df.to_parquet(tmp_path)
+    else:
+        df.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+#::------------------------------------------------------------------------
+# Compact dtypes for the cleaned frame
+#   numbers : downcast to the smallest width that holds every value exactly
+#             (a budget of 373554033 does not fit a float32, but it fits an int32)
+#   text    : low cardinality columns become categoricals, the others
+#             Arrow backed strings when pyarrow is installed
+# and the bytes saved on every column are reported.
+#::------------------------------------------------------------------------
+
+# text columns with fewer distinct values than this share of the rows become categoricals
+CATEGORY_RATIO = 0.5
+
+try:
+    ARROW_STRING = pd.StringDtype('pyarrow')
+except (ImportError, TypeError, AttributeError):
+    ARROW_STRING = None
+
+
+def _downcast_float(col):
+    # whole amounts without missing values (budget, revenue) are stored as integers
+    if col.notna().all() and np.isfinite(col.values).all() and (col.values % 1 == 0).all():
+        return pd.to_numeric(col.astype('int64'), downcast='integer')
+    # otherwise float32 only when every value survives the round trip
+    as_32 = col.astype('float32')
+    if np.array_equal(as_32.astype('float64').values, col.values, equal_nan=True):
+        return as_32
+    return col
+
+
+def _compact_column(col, category_ratio):
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return col
+    if pd.api.types.is_bool_dtype(col):
+        return col
+    if pd.api.types.is_integer_dtype(col) and not pd.api.types.is_extension_array_dtype(col):
+        return pd.to_numeric(col, downcast='integer')
+    if pd.api.types.is_float_dtype(col) and not pd.api.types.is_extension_array_dtype(col):
+        return _downcast_float(col)
+    if pd.api.types.is_object_dtype(col) or pd.api.types.is_string_dtype(col):
+        if col.nunique() < category_ratio * len(col):
+            return col.astype('category')
+        if ARROW_STRING is not None:
+            return col.astype(ARROW_STRING)
+    return col
+
+
+def compact_frame(df, category_ratio=CATEGORY_RATIO, verbose=True):
+    '''
+    Returns a copy of df with compact dtypes
+    :param df: data frame, e.g. merged_inner
+    :param category_ratio: see CATEGORY_RATIO
+    :param verbose: print the bytes saved per column
+    :return: compacted frame
+    '''
+    compacted = pd.DataFrame({name: _compact_column(df[name], category_ratio) for name in df.columns},
+                             index=df.index)
+    if verbose:
+        print(memory_report(df, compacted).to_string())
+    return compacted
+
+
+def memory_report(before, after):
+    #::--------------------------------------------------------
+    # dtype and bytes of every column before/after compaction
+    #::--------------------------------------------------------
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'dtype_after': after.dtypes.astype(str),
+        'bytes_before': before.memory_usage(index=False, deep=True),
+        'bytes_after': after.memory_usage(index=False, deep=True),
+    })
+    report['bytes_saved'] = report['bytes_before'] - report['bytes_after']
+    report.loc['total'] = ['', '', report['bytes_before'].sum(), report['bytes_after'].sum(), report['bytes_saved'].sum()]
+    return report
@@ -0,0 +1,76 @@
+import os
+import time
+from concurrent.futures import Future
+
+import imdb_loader
+import schemas
+
+#::------------------------------------------------------------------------
+# Concurrent loading of the five source files
+# movies_metadata.csv and the four IMDb dumps are parsed at the same time in
+# a thread pool (the C parser of pandas does most of the work, a process pool
+# would have to pickle every frame back). The IMDb semi-joins need keys that
+# are only known once the movies are cleaned (and the directors once
+# title_crew is read); they get those keys as futures, so every file starts
+# parsing immediately and only waits for its keys after a few chunks.
+#::------------------------------------------------------------------------
+
+TASKS = ['movies', 'crew', 'names', 'ratings', 'years']
+
+
+def _derived(future, fn):
+    #::--------------------------------------------------------
+    # Future of fn(future.result()), computed in the thread
+    # that completes future
+    #::--------------------------------------------------------
+    derived = Future()
+
+    def done(f):
+        try:
+            derived.set_result(fn(f.result()))
+        except Exception as e:
+            derived.set_exception(e)
+
+    future.add_done_callback(done)
+    return derived
+
+
+def _timed(timings, name, fn, *args, **kwargs):
+    start = time.time()
+    df = fn(*args, **kwargs)
+    timings[name] = (time.time() - start, len(df))
+    return df
+
+
+def submit_all(executor, movie_task, movie_keys, crew_file, names_file, ratings_file, year_file,
+               chunksize=imdb_loader.CHUNK_SIZE):
+    '''
+    Starts reading the five files in executor
+    The executor needs one worker per task (len(TASKS)) since the IMDb
+    readers block on their keys
+    :param movie_task: callable returning the cleaned movies frame
+    :param movie_keys: callable giving the integer title keys of that frame
+    :return: dict task name -> future of its frame, dict file name -> (seconds, rows)
+             filled as the tasks finish
+    '''
+    timings = {}
+    futures = {}
+
+    futures['movies'] = executor.submit(_timed, timings, 'movies (read + clean)', movie_task)
+    title_keys = _derived(futures['movies'], movie_keys)
+
+    def read(path, key_column, keys, schema):
+        return executor.submit(_timed, timings, os.path.basename(path), imdb_loader.read_filtered,
+                               path, key_column, keys, chunksize, **schemas.read_kwargs(schema))
+
+    futures['crew'] = read(crew_file, 'tconst', title_keys, schemas.TITLE_CREW)
+    director_keys = _derived(futures['crew'], imdb_loader.director_ids)
+    futures['names'] = read(names_file, 'nconst', director_keys, schemas.NAME_BASICS)
+    futures['ratings'] = read(ratings_file, 'tconst', title_keys, schemas.TITLE_RATINGS)
+    futures['years'] = read(year_file, 'tconst', title_keys, schemas.TITLE_YEAR)
+    return futures, timings
+
+
+def report_timings(timings):
+    for name, (seconds, rows) in timings.items():
+        print("%-25s %7.2f s  %8d rows kept" % (name, seconds, rows))
@@ -0,0 +1,119 @@
+import functools
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.holiday import USFederalHolidayCalendar
+
+#::------------------------------------------------------------------------
+# Release date stage
+# Every distinct release_date string is parsed once (and remembered for the
+# next call, the incremental ETL and the GUI parse the same dates again); the
+# calendar columns are then looked up in a precomputed table with one row per
+# day instead of being derived from every parsed timestamp:
+#       release_month, release_quarter, release_weekday (0 = Monday),
+#       release_decade, holiday_window (within HOLIDAY_WINDOW days of a US
+#       federal holiday, Thanksgiving/Christmas/July 4th releases)
+#::------------------------------------------------------------------------
+
+DATE_FORMAT = '%Y-%m-%d'
+# the calendar table covers these years, it is extended when a date falls outside
+FIRST_YEAR = 1870
+LAST_YEAR = 2040
+HOLIDAY_WINDOW = 7
+
+CALENDAR_COLUMNS = ['release_month', 'release_quarter', 'release_weekday', 'release_decade', 'holiday_window']
+# categories of release_month, the same whatever months a batch has
+MONTHS = pd.CategoricalDtype(range(1, 13))
+
+# parsed date of every string seen so far
+_parsed = pd.Series([], dtype='datetime64[ns]')
+
+
+def parse_dates(values):
+    '''
+    Parses a column of date strings, every distinct string once
+    :param values: series of 'YYYY-MM-DD' strings (or already parsed dates)
+    :return: datetime64 series aligned on values, NaT for the unparseable ones
+    '''
+    global _parsed
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Index(uniques).astype(str)
+
+    new = uniques[~uniques.isin(_parsed.index)]
+    if len(new):
+        parsed = pd.to_datetime(pd.Series(new, index=new), format=DATE_FORMAT, errors='coerce')
+        _parsed = pd.concat([_parsed, parsed.astype('datetime64[ns]')])
+
+    dates = _parsed.reindex(uniques).values.take(codes)
+    # factorize gives -1 for the missing values
+    dates[codes < 0] = np.datetime64('NaT')
+    return pd.Series(dates, index=values.index, name=values.name)
+
+
+@functools.lru_cache(maxsize=4)
+def calendar_table(first_year=FIRST_YEAR, last_year=LAST_YEAR):
+    '''
+    One row per day of first_year..last_year with the calendar columns
+    :return: DataFrame indexed by date
+    '''
+    days = pd.date_range('%d-01-01' % first_year, '%d-12-31' % last_year, freq='D')
+    holidays = USFederalHolidayCalendar().holidays(days[0] - pd.Timedelta(days=HOLIDAY_WINDOW),
+                                                   days[-1] + pd.Timedelta(days=HOLIDAY_WINDOW))
+
+    # distance to the closest holiday, through the position of the day in the sorted holidays
+    pos = np.clip(holidays.searchsorted(days), 1, len(holidays) - 1)
+    to_next = np.abs((holidays[pos] - days).days)
+    to_previous = np.abs((days - holidays[pos - 1]).days)
+
+    return pd.DataFrame({
+        'release_month': days.month.astype('int8'),
+        'release_quarter': days.quarter.astype('int8'),
+        'release_weekday': days.weekday.astype('int8'),
+        'release_decade': (days.year // 10 * 10).astype('int16'),
+        'holiday_window': np.minimum(to_next, to_previous) <= HOLIDAY_WINDOW,
+    }, index=days)
+
+
+def calendar_features(dates):
+    '''
+    Calendar columns of parsed dates, looked up by position in calendar_table
+    :param dates: datetime64 series
+    :return: DataFrame with CALENDAR_COLUMNS aligned on dates, nullable
+             integers (Int8, Int16) with <NA> where the date is missing
+             (holiday_window False), so a missing date never turns the
+             columns into floats
+    '''
+    valid = dates.notna().values
+    years = dates.dt.year[valid]
+    first_year = min(FIRST_YEAR, int(years.min())) if len(years) else FIRST_YEAR
+    last_year = max(LAST_YEAR, int(years.max())) if len(years) else LAST_YEAR
+    table = calendar_table(first_year, last_year)
+
+    day = np.zeros(len(dates), dtype='int64')
+    day[valid] = (dates[valid].values - table.index[0].to_datetime64()) // np.timedelta64(1, 'D')
+
+    features = {}
+    for col in CALENDAR_COLUMNS:
+        values = table[col].values.take(day)
+        if col == 'holiday_window':
+            values = values & valid
+        else:
+            # int8 -> Int8, int16 -> Int16
+            values = pd.array(values, dtype=values.dtype.name.capitalize())
+            values[~valid] = pd.NA
+        features[col] = values
+    return pd.DataFrame(features, index=dates.index)
+
+
+def add_date_features(df, column='release_date'):
+    '''
+    Replaces column by its parsed dates and adds the calendar columns,
+    release_month as a category of the months 1..12 like the models expect
+    :return: new frame
+    '''
+    dates = parse_dates(df[column])
+    features = calendar_features(dates)
+    features['release_month'] = features['release_month'].astype(MONTHS)
+    return df.assign(**{column: dates}, **features)
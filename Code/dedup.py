@@ -0,0 +1,42 @@
+#::------------------------------------------------------------------------
+# Key based deduplication of merged_inner
+# The duplicated rows of merged_inner come from imdb_ids repeated in
+# movies_metadata.csv (tt0270288 is listed twice, with two popularities) and
+# from joins matching a movie more than once. Instead of hashing every column
+# of every row at the end, every join records its fan-out (rows in, rows out,
+# most matches of one movie) and the final frame is deduplicated on the
+# integer movie_key alone.
+#::------------------------------------------------------------------------
+
+KEY = 'movie_key'
+# which row of a duplicated movie is kept: the first/last in file order, or none of them
+KEEP_POLICIES = {'first': 'first', 'last': 'last', 'none': False}
+
+
+def fanout(left, merged, key=KEY):
+    '''
+    Fan-out of a join, costs one value_counts on the integer key
+    :param left: frame before the join
+    :param merged: frame after the join
+    :return: dict rows_in, rows_out, max_matches (most rows of one movie after the join)
+    '''
+    counts = merged[key].value_counts()
+    return {'rows_in': len(left), 'rows_out': len(merged), 'max_matches': int(counts.max()) if len(counts) else 0}
+
+
+def report_fanout(fanouts):
+    for name, stats in fanouts.items():
+        flag = '  <- fan-out' if stats['max_matches'] > 1 else ''
+        print("%-25s %8d -> %8d rows  max %d per movie%s"
+              % (name, stats['rows_in'], stats['rows_out'], stats['max_matches'], flag))
+
+
+def drop_duplicate_keys(df, keep='first', key=KEY):
+    '''
+    Keeps one row per movie
+    :param keep: one of KEEP_POLICIES
+    :return: df without the duplicated keys
+    '''
+    if keep not in KEEP_POLICIES:
+        raise ValueError("keep must be one of %s, got %r" % (sorted(KEEP_POLICIES), keep))
+    return df[~df[key].duplicated(keep=KEEP_POLICIES[keep]).values]
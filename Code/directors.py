@@ -0,0 +1,50 @@
+import pandas as pd
+
+import imdb_keys
+
+#::------------------------------------------------------------------------
+# Director edges
+# title_crew's directors field is a comma separated list of nconst
+# ('nm0001,nm0002' for a co-directed movie). Instead of matching the whole
+# field against nconst, which silently drops every co-directed movie, the
+# list is exploded once into a (tconst, nconst, ordinal) edge table and the
+# names are attached with a single hash join on the integer nconst.
+#::------------------------------------------------------------------------
+
+
+def director_edges(dir_id_imdb):
+    '''
+    Explodes title_crew into one row per (movie, director)
+    :param dir_id_imdb: title_crew frame with integer tconst and the directors string
+    :return: DataFrame tconst, nconst (int64), ordinal (0 for the first listed director)
+    '''
+    crew = dir_id_imdb[['tconst', 'directors']].dropna().reset_index(drop=True)
+    edges = crew.assign(nconst=crew['directors'].str.split(',')).explode('nconst')
+    # position of the director in the list, the index still points at the crew row
+    edges['ordinal'] = edges.groupby(level=0).cumcount()
+
+    edges['nconst'] = imdb_keys.encode(edges['nconst']).values
+    edges = edges[edges['nconst'].notna()]
+    return edges.astype({'nconst': 'int64'})[['tconst', 'nconst', 'ordinal']].reset_index(drop=True)
+
+
+def name_edges(edges, dir_name_imdb):
+    '''
+    All-directors view: the edges with the director name attached
+    :param edges: output of director_edges
+    :param dir_name_imdb: name_basics frame with integer nconst
+    :return: DataFrame tconst, nconst, ordinal, Director
+    '''
+    names = dir_name_imdb[['nconst', 'primaryName']].rename(columns={'primaryName': 'Director'})
+    return pd.merge(left=edges, right=names, on='nconst')
+
+
+def primary_directors(named_edges):
+    '''
+    Primary-director view: one row per movie, the first listed director
+    that has a name in name_basics
+    :param named_edges: output of name_edges
+    :return: DataFrame tconst, Director
+    '''
+    named_edges = named_edges.sort_values(['tconst', 'ordinal'], kind='mergesort')
+    return named_edges.drop_duplicates('tconst')[['tconst', 'Director']].reset_index(drop=True)
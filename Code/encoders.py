@@ -0,0 +1,298 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.base import BaseEstimator, TransformerMixin
+
+import json_columns
+
+#::------------------------------------------------------------------------
+# Encoders for the categorical columns
+# pd.get_dummies(X) gives a dense frame with one column per production
+# company, about a thousand columns of zeros that every model copies again.
+# The encoders here are fitted once, so the vocabulary (and the column order)
+# of the training data is reused for the test data, the GUI and any later
+# scoring:
+#       SparseOneHotEncoder : one-hot columns in a scipy CSR matrix
+#       TargetEncoder       : two dense columns per high cardinality column
+#                             (Production_Company, Director), the smoothed
+#                             success rate and the frequency of the level
+#       MultiHotEncoder     : every genre/company of the json lists of
+#                             movies_metadata, not only the first one
+#       HashingEncoder      : no vocabulary at all, every level is hashed
+#                             into a fixed number of columns, so the width
+#                             stays the same when the catalogue grows
+#::------------------------------------------------------------------------
+
+# levels seen less often than this in the training data share the 'other' column
+MIN_FREQUENCY = 5
+OTHER = 'other'
+# weight of the overall success rate in the rate of a level, in rows
+SMOOTHING = 10
+# folds of the out-of-fold target encoding of the training rows
+N_FOLDS = 5
+# hashed columns per encoded column
+HASH_FEATURES = 1024
+
+
+def _factorize(values):
+    #::--------------------------------------------------------
+    # codes of values in its distinct levels, the levels as
+    # strings (release_month has int categories), -1 for NaN
+    #::--------------------------------------------------------
+    codes, uniques = pd.factorize(pd.Series(values))
+    return codes, pd.Index([str(level) for level in uniques], dtype=object)
+
+
+def _level_codes(values, levels):
+    # position of every value in the fitted levels, -1 for the unseen and missing ones
+    codes, uniques = _factorize(values)
+    return np.where(codes >= 0, levels.get_indexer(uniques).take(codes), -1)
+
+
+class SparseOneHotEncoder(BaseEstimator, TransformerMixin):
+    '''
+    One-hot encoding into a CSR matrix with a stable column vocabulary
+    Every column gets one output column per frequent level, in sorted order,
+    plus an 'other' column for the rare, unseen and missing levels; every row
+    has exactly one 1 per encoded column.
+    :param columns: columns of the data frame to encode
+    :param min_frequency: see MIN_FREQUENCY
+    '''
+
+    def __init__(self, columns, min_frequency=MIN_FREQUENCY):
+        self.columns = columns
+        self.min_frequency = min_frequency
+
+    def fit(self, X, y=None):
+        self.vocabulary_ = {}
+        self.offsets_ = {}
+        width = 0
+        for col in self.columns:
+            codes, uniques = _factorize(X[col])
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            levels = pd.Index(sorted(uniques[counts >= self.min_frequency]), dtype=object)
+            self.vocabulary_[col] = levels
+            self.offsets_[col] = width
+            width += len(levels) + 1        # + the 'other' column
+        self.n_features_out_ = width
+        return self
+
+    def transform(self, X):
+        n_rows = len(X)
+        indices = np.empty((n_rows, len(self.columns)), dtype=np.int32)
+        for j, col in enumerate(self.columns):
+            levels = self.vocabulary_[col]
+            codes = _level_codes(X[col], levels)
+            codes[codes < 0] = len(levels)
+            indices[:, j] = self.offsets_[col] + codes
+
+        # row i holds the columns indices[i, :], already in increasing order
+        indptr = np.arange(0, indices.size + 1, len(self.columns), dtype=np.int64)
+        data = np.ones(indices.size, dtype=np.float64)
+        return sparse.csr_matrix((data, indices.ravel(), indptr), shape=(n_rows, self.n_features_out_))
+
+    def get_feature_names_out(self, input_features=None):
+        names = []
+        for col in self.columns:
+            names += ['%s_%s' % (col, level) for level in self.vocabulary_[col]] + ['%s_%s' % (col, OTHER)]
+        return np.array(names, dtype=object)
+
+
+class TargetEncoder(BaseEstimator, TransformerMixin):
+    '''
+    Target and frequency encoding of high cardinality columns
+    For every column: (success count of the level + smoothing * prior) /
+    (rows of the level + smoothing), and the share of the training rows in
+    the level. Unseen and missing levels get the prior and a frequency of 0.
+    All the statistics are np.bincount reductions over the level codes.
+    fit_transform returns the out-of-fold rates for the training rows: the
+    rate of a row only uses the rows of the other folds, so a model cannot
+    learn the target of a movie back from its own director.
+    :param columns: columns of the data frame to encode
+    :param smoothing: see SMOOTHING
+    :param n_folds: see N_FOLDS
+    '''
+
+    def __init__(self, columns, smoothing=SMOOTHING, n_folds=N_FOLDS, random_state=0):
+        self.columns = columns
+        self.smoothing = smoothing
+        self.n_folds = n_folds
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        y = np.asarray(y, dtype=np.float64).ravel()
+        self.prior_ = y.mean()
+        self.n_rows_ = len(y)
+        self.levels_, self.counts_, self.sums_ = {}, {}, {}
+        for col in self.columns:
+            codes, levels = _factorize(X[col])
+            valid = codes >= 0
+            self.levels_[col] = levels
+            self.counts_[col] = np.bincount(codes[valid], minlength=len(levels))
+            self.sums_[col] = np.bincount(codes[valid], weights=y[valid], minlength=len(levels))
+        return self
+
+    def _rate(self, sums, counts):
+        return (sums + self.smoothing * self.prior_) / (counts + self.smoothing)
+
+    def transform(self, X):
+        encoded = np.empty((len(X), 2 * len(self.columns)))
+        for j, col in enumerate(self.columns):
+            codes = _level_codes(X[col], self.levels_[col])
+            # the code -1 of the unseen levels picks the appended zero
+            counts = np.append(self.counts_[col], 0).take(codes)
+            sums = np.append(self.sums_[col], 0.0).take(codes)
+            encoded[:, 2 * j] = self._rate(sums, counts)
+            encoded[:, 2 * j + 1] = counts / self.n_rows_
+        return encoded
+
+    def fit_transform(self, X, y):
+        '''
+        Fits on X, y and returns the out-of-fold encoding of X
+        '''
+        self.fit(X, y)
+        y = np.asarray(y, dtype=np.float64).ravel()
+        folds = np.random.RandomState(self.random_state).permutation(len(y)) % self.n_folds
+
+        encoded = self.transform(X)
+        for j, col in enumerate(self.columns):
+            codes = _level_codes(X[col], self.levels_[col])
+            valid = codes >= 0
+            n_levels = len(self.levels_[col])
+            # counts and sums of every (fold, level) pair, then those of the other folds by difference
+            pair = folds[valid] * n_levels + codes[valid]
+            fold_counts = np.bincount(pair, minlength=self.n_folds * n_levels)
+            fold_sums = np.bincount(pair, weights=y[valid], minlength=self.n_folds * n_levels)
+            counts = self.counts_[col][codes[valid]] - fold_counts[pair]
+            sums = self.sums_[col][codes[valid]] - fold_sums[pair]
+            encoded[valid, 2 * j] = self._rate(sums, counts)
+        return encoded
+
+    def get_feature_names_out(self, input_features=None):
+        return np.array([name for col in self.columns for name in ('%s_rate' % col, '%s_frequency' % col)], dtype=object)
+
+
+class MultiHotEncoder(BaseEstimator, TransformerMixin):
+    '''
+    Multi-hot encoding of json list columns (genres, production_companies)
+    into a CSR matrix, one column per frequent name plus 'other'
+    The lists are parsed once per distinct cell (json_columns.entry_offsets)
+    into a small CSR matrix over the distinct cells, whose rows are then
+    picked for every movie; the entries are never expanded to one row each.
+    :param columns: json list columns of the data frame
+    :param min_frequency: names on fewer training rows share the 'other' column
+    '''
+
+    def __init__(self, columns, min_frequency=MIN_FREQUENCY):
+        self.columns = columns
+        self.min_frequency = min_frequency
+
+    def fit(self, X, y=None):
+        self.vocabulary_ = {}
+        self.offsets_ = {}
+        width = 0
+        for col in self.columns:
+            codes, indptr, fields = json_columns.entry_offsets(X[col])
+            # rows of every distinct cell, given to each of its entries
+            cell_rows = np.bincount(codes[codes >= 0], minlength=len(indptr) - 1)
+            entry_rows = np.repeat(cell_rows, np.diff(indptr))
+            name_codes, names = _factorize(fields['name'])
+            rows = np.bincount(name_codes[name_codes >= 0], weights=entry_rows[name_codes >= 0], minlength=len(names))
+            self.vocabulary_[col] = pd.Index(sorted(names[rows >= self.min_frequency]), dtype=object)
+            self.offsets_[col] = width
+            width += len(self.vocabulary_[col]) + 1
+        self.n_features_out_ = width
+        return self
+
+    def transform(self, X):
+        # the empty block keeps the width of an encoder without columns
+        blocks = [sparse.csr_matrix((len(X), 0))]
+        for col in self.columns:
+            levels = self.vocabulary_[col]
+            codes, indptr, fields = json_columns.entry_offsets(X[col])
+            entry_cols = _level_codes(fields['name'], levels)
+            entry_cols[entry_cols < 0] = len(levels)
+
+            # one row per distinct cell plus an empty one for the missing cells
+            n_cells = len(indptr) - 1
+            cells = sparse.csr_matrix((np.ones(len(entry_cols)), entry_cols, indptr), shape=(n_cells, len(levels) + 1))
+            cells = sparse.vstack([cells, sparse.csr_matrix((1, len(levels) + 1))], format='csr')
+            # a cell listing two rare names has one 'other'
+            cells.sum_duplicates()
+            cells.data[:] = 1.0
+            blocks.append(cells[np.where(codes >= 0, codes, n_cells)])
+        return sparse.hstack(blocks, format='csr')
+
+    def get_feature_names_out(self, input_features=None):
+        names = []
+        for col in self.columns:
+            names += ['%s_%s' % (col, level) for level in self.vocabulary_[col]] + ['%s_%s' % (col, OTHER)]
+        return np.array(names, dtype=object)
+
+
+class HashingEncoder(BaseEstimator, TransformerMixin):
+    '''
+    Signed feature hashing into a CSR matrix of fixed width
+    Every column has its own block of n_features columns; a level goes to
+    the column hash % n_features of its block with the sign given by the top
+    bit of the hash (colliding levels cancel out on average instead of
+    adding up). The hash (pd.util.hash_array) is stable between runs and
+    computed once per distinct level. Nothing is learned in fit, a new
+    production company simply lands in an existing column.
+    The json list columns (production_companies) get a block too, every
+    entry of a cell is hashed into it, the entries of the distinct cells
+    only (json_columns.entry_offsets) like MultiHotEncoder.
+    :param columns: columns of the data frame to encode
+    :param n_features: see HASH_FEATURES
+    :param lists: json list columns of the data frame to encode, blocks after those of columns
+    '''
+
+    def __init__(self, columns, n_features=HASH_FEATURES, lists=()):
+        self.columns = columns
+        self.n_features = n_features
+        self.lists = lists
+
+    def fit(self, X=None, y=None):
+        self.n_features_out_ = self.n_features * (len(self.columns) + len(self.lists))
+        return self
+
+    def _hash(self, values, block):
+        # column in the block and sign of every value
+        hashes = pd.util.hash_array(np.asarray(values, dtype=object))
+        bucket = (hashes % np.uint64(self.n_features)).astype(np.int64) + block * self.n_features
+        return bucket, np.where(hashes >> np.uint64(63), -1.0, 1.0)
+
+    def _hash_lists(self, values, block):
+        #::--------------------------------------------------------
+        # every entry of every cell of a json list column hashed into
+        # the block, one CSR row per distinct cell then picked per row
+        #::--------------------------------------------------------
+        codes, indptr, fields = json_columns.entry_offsets(values)
+        bucket, sign = self._hash(fields['name'].fillna('').values, block)
+        n_cells = len(indptr) - 1
+        cells = sparse.csr_matrix((sign, bucket, indptr), shape=(n_cells, self.n_features_out_))
+        # plus an empty row for the missing cells
+        cells = sparse.vstack([cells, sparse.csr_matrix((1, self.n_features_out_))], format='csr')
+        cells.sum_duplicates()
+        return cells[np.where(codes >= 0, codes, n_cells)]
+
+    def transform(self, X):
+        rows, cols, data = [np.empty(0, np.int64)], [np.empty(0, np.int64)], [np.empty(0)]
+        for j, col in enumerate(self.columns):
+            codes, uniques = _factorize(X[col])
+            bucket, sign = self._hash(uniques.values, j)
+
+            # missing values have no column
+            present = np.flatnonzero(codes >= 0)
+            rows.append(present)
+            cols.append(bucket.take(codes[present]))
+            data.append(sign.take(codes[present]))
+        hashed = sparse.csr_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+                                   shape=(len(X), self.n_features_out_))
+        for k, col in enumerate(self.lists):
+            hashed = hashed + self._hash_lists(X[col], len(self.columns) + k)
+        return hashed
+
+    def get_feature_names_out(self, input_features=None):
+        return np.array(['%s_hash%d' % (col, i) for col in list(self.columns) + list(self.lists)
+                         for i in range(self.n_features)], dtype=object)
@@ -0,0 +1,417 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import cache
+import concurrent_loader
+import dates
+import dedup
+import directors
+import imdb_keys
+import imdb_loader
+import imdb_store
+import json_columns
+import plan
+import schemas
+
+#::------------------------------------------------------------------------
+# ETL for the movie success project
+# Reads movies_metadata.csv (Kaggle) plus the four IMDb files, cleans them and
+# returns the merged_inner frame used by the EDA, the models and the GUI.
+#::------------------------------------------------------------------------
+
+MOVIES_FILE = 'movies_metadata.csv'
+CREW_FILE = 'title_crew.tsv'
+NAMES_FILE = 'name_basics.tsv'
+RATINGS_FILE = 'title_ratings.tsv'
+YEAR_FILE = 'title_year.tsv'
+IMDB_FILES = {'crew': CREW_FILE, 'names': NAMES_FILE, 'ratings': RATINGS_FILE, 'years': YEAR_FILE}
+
+# bump when the cleaning code changes so that old cached frames are not reused
+ETL_VERSION = 9
+
+CLEANING_PARAMS = {
+    'min_budget': 100000,       # only movies with budget greater than $100,000
+    'min_revenue': 1000,        # & revenue greater than $1000
+    'min_vote_count': 100,      # atleast 100 people voted for the movie
+    'duplicate_keep': 'first',  # row kept for a movie listed more than once, see dedup.KEEP_POLICIES
+}
+
+
+def imdb_files():
+    #::--------------------------------------------------------
+    # The IMDb dumps on disk, plain .tsv or gzipped as published
+    # by IMDb (see imdb_loader.dump_path)
+    #::--------------------------------------------------------
+    return {table: imdb_loader.dump_path(path) for table, path in IMDB_FILES.items()}
+
+
+def source_files():
+    return [MOVIES_FILE] + list(imdb_files().values())
+
+
+def imdb_hashes(store_file=imdb_store.STORE_FILE):
+    #::--------------------------------------------------------
+    # sha1 of every IMDb dump, table -> hex digest. A dump deleted
+    # after the store was built (python imdb_store.py) is
+    # identified by the sha1 the store recorded for its table
+    #::--------------------------------------------------------
+    stored = imdb_store.source_hashes(store_file) if os.path.exists(store_file) else {}
+    return {table: stored[table] if not os.path.exists(path) and table in stored else cache.file_hash(path)
+            for table, path in imdb_files().items()}
+
+
+def read_movies():
+    #::--------------------------------------------------------
+    # Reads the used columns of the Kaggle movies_metadata.csv
+    #::--------------------------------------------------------
+    return pd.read_csv(MOVIES_FILE, **schemas.read_kwargs(schemas.MOVIES))
+
+
+def read_imdb(imdb_ids, store_file=imdb_store.STORE_FILE):
+    #::--------------------------------------------------------
+    # Reads the four IMDb tables, keeping only the rows of the
+    # movies in imdb_ids (integer keys). Uses the indexed store
+    # when it has been built (python imdb_store.py), refreshing
+    # the tables whose dump changed, otherwise streams the dumps
+    # (see imdb_loader.py)
+    #::--------------------------------------------------------
+    files = imdb_files()
+    if os.path.exists(store_file):
+        imdb_store.build_store(files, store_file)
+        return imdb_store.load_imdb_tables(imdb_ids, store_file)
+    return imdb_loader.load_imdb_tables(imdb_ids, files['crew'], files['names'], files['ratings'], files['years'])
+
+
+def _parse_budget(df):
+    # budget column contains alpha-numeric characters, so need to fix it
+    budget = df['budget'].str.extract(r'(\d+)', expand=False)   # removing all non-numeric values from budget column
+    # changing budget column from object to float
+    return df.assign(budget=budget.astype(float).fillna(0.0))
+
+
+def _parse_popularity(df):
+    # same for popularity, the corrupted rows become NaN
+    return df.assign(popularity=pd.to_numeric(df['popularity'], errors='coerce'))
+
+
+def _success_target(df):
+    # creating our target/label column showing status i.e success/flop movie.
+    status = df["revenue"]/df["budget"]
+    # Our criteria for success is any value greater than 1 else flop
+    New_status = pd.Series(np.nan, index=df.index)      # creating a new empty target column called New_Status
+    New_status = New_status.mask(status > 1, 1)
+    New_status = New_status.mask(status <= 1, 0)
+    return df.assign(status=status, New_status=New_status.astype("category"))      # converting from float to categorical datatye
+
+
+def cleaning_plan(params=CLEANING_PARAMS):
+    '''
+    The cleaning of movies_metadata as a lazy plan (see plan.py)
+    The steps are declared parse first, filter last; when the plan runs every
+    filter is pushed ahead of the parsing it does not depend on, so the json
+    parsing only sees the movies that pass the numeric filters.
+    print('\\n'.join(cleaning_plan().explain())) shows the execution order
+    :param params: cleaning thresholds, see CLEANING_PARAMS
+    :return: plan.Plan
+    '''
+    return plan.Plan([
+        # integer surrogate key of the movie (see imdb_keys.py), every join runs on it
+        # and the imdb_id string is only rebuilt in finalize
+        plan.derive('movie key', lambda df: df.assign(movie_key=imdb_keys.encode(df['imdb_id']).values),
+                    reads=['imdb_id'], writes=['movie_key']),
+        plan.keep('has movie key', lambda df: df['movie_key'].notna(), reads=['movie_key']),
+
+        plan.derive('parse budget', _parse_budget, reads=['budget'], writes=['budget']),
+        plan.derive('parse popularity', _parse_popularity, reads=['popularity'], writes=['popularity']),
+        plan.derive('success target', _success_target, reads=['revenue', 'budget'], writes=['status', 'New_status']),
+
+        # converting (genre) json column to normal string column
+        # only the major (first) genre of every movie is kept, parsed in one vectorized pass (see json_columns.py)
+        plan.derive('major genre', lambda df: df.assign(Genre=json_columns.first_entry(df['genres'])['name']),
+                    reads=['genres'], writes=['Genre']),
+        plan.keep('has genre', lambda df: df['Genre'].notna(), reads=['Genre']),
+
+        # converting (production_companies) json column to normal string column
+        # keeping only the major (first) production company of every movie
+        plan.derive('major production company',
+                    lambda df: df.assign(Production_Company=json_columns.first_entry(df['production_companies'])['name']),
+                    reads=['production_companies'], writes=['Production_Company']),
+        plan.keep('has production company', lambda df: df['Production_Company'].notna(), reads=['Production_Company']),
+
+        # subsetting df to only movies with budget greater than $100,000 & revenue greater than $1000
+        plan.keep('min budget', lambda df: df['budget'] > params['min_budget'], reads=['budget']),
+        plan.keep('min revenue', lambda df: df['revenue'] > params['min_revenue'], reads=['revenue']),
+        # there are many entries where the number of people who voted for a movie are 1, 2 , 3 etc. They need to be removed otherwise it will create bias
+        plan.keep('min vote count', lambda df: df['vote_count'] > params['min_vote_count'], reads=['vote_count']),
+        plan.keep('rated', lambda df: df['vote_average'] > 0, reads=['vote_average']),
+    ])
+
+
+def clean_movies(movie_data_orig, params=CLEANING_PARAMS):
+    '''
+    Cleans the Kaggle movies_metadata frame by running cleaning_plan
+    :param movie_data_orig: raw movies_metadata.csv frame
+    :param params: cleaning thresholds, see CLEANING_PARAMS
+    :return: one row per movie with Genre, Production_Company (the first listed), the genres and
+             production_companies json lists and the New_status target
+    '''
+    # keeping only the relevant columns, a no-op when the file was read with schemas.MOVIES
+    df_cleaned = cleaning_plan(params).execute(movie_data_orig[schemas.MOVIES['usecols']])
+    df_cleaned = df_cleaned.astype({'movie_key': 'int64'})
+
+    # the json lists are kept for the multi-hot encoding of every genre and company (see encoders.MultiHotEncoder)
+    cols = ['budget', 'movie_key', 'popularity', 'original_language', 'release_date', 'revenue', 'runtime', 'title',
+            'vote_average', 'vote_count', 'status', 'New_status', 'Genre', 'Production_Company', 'genres',
+            'production_companies']
+    return df_cleaned[cols]
+
+
+def _join(merged_inner, right, name, fanouts=None):
+    # inner join of an IMDb table on the integer movie key, its fan-out is recorded in fanouts (see dedup.py)
+    merged = pd.merge(left=merged_inner, right=right, left_on='movie_key', right_on='tconst')
+    if fanouts is not None:
+        fanouts[name] = dedup.fanout(merged_inner, merged)
+    return merged
+
+
+def merge_directors(merged_inner, dir_id_imdb, dir_name_imdb, fanouts=None):
+    # Adding Director col using imdb files
+    # the directors list is exploded into edges so co-directed movies are kept, with their first listed director
+    edges = directors.name_edges(directors.director_edges(dir_id_imdb), dir_name_imdb)
+    merged_inner = _join(merged_inner, directors.primary_directors(edges), 'directors', fanouts)
+    return merged_inner.drop(["tconst"], axis=1)     # removing irrelevant cols
+
+
+def merge_ratings(merged_inner, ratings_imdb, fanouts=None):
+    # Adding Avg_ratings & Total votes cols using imdb files
+    merged_inner = _join(merged_inner, ratings_imdb, 'ratings', fanouts)
+    return merged_inner.drop(["tconst", "vote_average", "vote_count"], axis=1)     # removing old vote_avg/count cols
+
+
+def merge_years(merged_inner, releaseYr_imdb, fanouts=None):
+    # Adding Movie release year column from imdb file
+    merged_inner = _join(merged_inner, releaseYr_imdb, 'years', fanouts)
+    return merged_inner.drop(["tconst"], axis=1)
+
+
+def add_imdb_columns(df_cleaned, dir_id_imdb, dir_name_imdb, ratings_imdb, releaseYr_imdb, fanouts=None):
+    '''
+    Adds Director, averageRating, numVotes and startYear from the IMDb files
+    The IMDb tables come with integer tconst/nconst keys
+    :param fanouts: optional dict, filled with the fan-out of every join
+    :return: merged_inner frame
+    '''
+    merged_inner = merge_directors(df_cleaned, dir_id_imdb, dir_name_imdb, fanouts)
+    merged_inner = merge_ratings(merged_inner, ratings_imdb, fanouts)
+    return merge_years(merged_inner, releaseYr_imdb, fanouts)
+
+
+def finalize(merged_inner, keep=CLEANING_PARAMS['duplicate_keep']):
+    '''
+    Derives the calendar columns, fixes dtypes, orders the columns and removes duplicates
+    :param keep: row kept for a movie listed more than once, see dedup.KEEP_POLICIES
+    :return: merged_inner frame
+    '''
+    # converting release_date to datetime and extracting month, quarter, weekday... from it (see dates.py)
+    merged_inner = dates.add_date_features(merged_inner)
+
+    # imdb_id string for display, rebuilt from the integer key
+    merged_inner['imdb_id'] = imdb_keys.decode(merged_inner['movie_key']).values
+
+    # Setting StartYear col beside release_date col
+    cols = ['budget', 'imdb_id', 'popularity', 'release_date', 'startYear'] + dates.CALENDAR_COLUMNS + ['revenue', 'runtime', 'title', 'Genre', 'Production_Company', 'Director', 'averageRating', 'numVotes', 'original_language', 'status', 'New_status', 'movie_key', 'genres', 'production_companies']
+    merged_inner = merged_inner[cols]
+
+    merged_inner['startYear'] = merged_inner['startYear'].astype(int)     # converting startYear to int instead of nullable Int16
+
+    # Removing Duplicates, on the integer key instead of a hash of every column
+    merged_inner = dedup.drop_duplicate_keys(merged_inner, keep)
+    return merged_inner
+
+
+def run_etl(params=CLEANING_PARAMS, verbose=True):
+    '''
+    Full ETL from the raw files, no cache involved
+    Without the IMDb store the five files are read concurrently and every
+    IMDb table is merged as soon as it is ready (see concurrent_loader.py)
+    :param verbose: print the time spent on every file and the fan-out of every join
+    :return: merged_inner frame
+    '''
+    if os.path.exists(imdb_store.STORE_FILE):
+        return enrich(clean_movies(read_movies(), params), params, verbose)
+
+    files = imdb_files()
+    with ThreadPoolExecutor(max_workers=len(concurrent_loader.TASKS)) as executor:
+        # the IMDb dumps are semi-joined against the surviving movies while they are read
+        futures, timings = concurrent_loader.submit_all(
+            executor, lambda: clean_movies(read_movies(), params), lambda df: df['movie_key'],
+            files['crew'], files['names'], files['ratings'], files['years'])
+
+        merge_stages = {
+            futures['names']: lambda df, names, fanouts: merge_directors(df, futures['crew'].result(), names, fanouts),
+            futures['ratings']: merge_ratings,
+            futures['years']: merge_years,
+        }
+        merged_inner = futures['movies'].result()
+        # Kaggle lists a few imdb_ids twice, shown as the fan-out of the movies themselves
+        fanouts = {'movies_metadata': dedup.fanout(merged_inner, merged_inner)}
+        for future in as_completed(merge_stages):
+            merged_inner = merge_stages[future](merged_inner, future.result(), fanouts)
+
+    if verbose:
+        concurrent_loader.report_timings(timings)
+        dedup.report_fanout(fanouts)
+    return finalize(merged_inner, params['duplicate_keep'])
+
+
+#::------------------------------------------------------------------------
+# Incremental ETL
+# The state of the last run is kept in INCREMENTAL_DIR: a hash of the raw
+# movies_metadata rows of every imdb_id, the cleaned Kaggle frame (before the
+# IMDb merges) and merged_inner. A new snapshot is diffed against it by
+# imdb_id and only the added or changed movies go through the json parsing,
+# the filters and the IMDb enrichment. When an IMDb dump changed, the kept
+# movies are re-enriched from their cleaned rows, the Kaggle side is not
+# redone.
+#::------------------------------------------------------------------------
+
+INCREMENTAL_DIR = os.path.join(cache.CACHE_DIR, 'incremental')
+INCREMENTAL_STATE = 'state.json'
+
+
+def snapshot_hashes(movie_data_orig):
+    '''
+    Fingerprint of every movie of a raw movies_metadata frame
+    :return: uint64 series indexed by movie_key, the sum of the hashes of the
+             raw rows of that movie (Kaggle has a few duplicated imdb_ids)
+    '''
+    keys = imdb_keys.encode(movie_data_orig['imdb_id'])
+    row_hash = pd.util.hash_pandas_object(movie_data_orig[schemas.MOVIES['usecols']], index=False)
+    valid = keys.notna().values
+    hashes = pd.Series(row_hash.values[valid], index=keys[valid].astype('int64').values)
+    return hashes.groupby(level=0).sum()
+
+
+def enrich(df_cleaned, params=CLEANING_PARAMS, verbose=False):
+    #::--------------------------------------------------------
+    # IMDb merges and finalize for a cleaned Kaggle frame
+    #::--------------------------------------------------------
+    dir_id_imdb, dir_name_imdb, ratings_imdb, releaseYr_imdb = read_imdb(df_cleaned['movie_key'])
+    fanouts = {'movies_metadata': dedup.fanout(df_cleaned, df_cleaned)}
+    merged_inner = add_imdb_columns(df_cleaned, dir_id_imdb, dir_name_imdb, ratings_imdb, releaseYr_imdb, fanouts)
+    if verbose:
+        dedup.report_fanout(fanouts)
+    return finalize(merged_inner, params['duplicate_keep'])
+
+
+def _concat(old, new):
+    #::--------------------------------------------------------
+    # pd.concat that keeps the categorical columns of old
+    # categorical when the categories of new differ
+    #::--------------------------------------------------------
+    df = pd.concat([old, new], ignore_index=True)
+    for col in old.select_dtypes('category').columns:
+        df[col] = df[col].astype('category')
+    return df
+
+
+def _save_incremental_state(state_dir, state, hashes, df_cleaned, merged_inner):
+    os.makedirs(state_dir, exist_ok=True)
+    cache.save_frame(hashes.rename('row_hash').rename_axis('movie_key').reset_index(), 'snapshot', state_dir)
+    cache.save_frame(df_cleaned.reset_index(drop=True), 'cleaned', state_dir)
+    cache.save_frame(merged_inner, 'merged_inner', state_dir)
+    # the state file goes last, it marks the three frames as consistent
+    with open(os.path.join(state_dir, INCREMENTAL_STATE), 'w') as f:
+        json.dump(state, f, indent=1)
+
+
+def update_incremental(params=CLEANING_PARAMS, state_dir=INCREMENTAL_DIR, verbose=True):
+    '''
+    Brings the stored dataset up to date with the current source files,
+    processing only the movies that were added or changed since the last run.
+    The first run, or a run with other cleaning parameters or ETL_VERSION,
+    processes everything
+    :return: merged_inner frame
+    '''
+    build = dict(params, etl_version=ETL_VERSION)
+    dump_hashes = imdb_hashes()
+    state = {'build': build, 'imdb': dump_hashes}
+
+    movie_data_orig = read_movies()
+    new_hashes = snapshot_hashes(movie_data_orig)
+
+    state_file = os.path.join(state_dir, INCREMENTAL_STATE)
+    old_state = None
+    if os.path.exists(state_file):
+        with open(state_file) as f:
+            old_state = json.load(f)
+
+    if old_state is None or old_state['build'] != build:
+        df_cleaned = clean_movies(movie_data_orig, params)
+        merged_inner = enrich(df_cleaned, params, verbose)
+        if verbose:
+            print("incremental ETL: full build, %d movies" % len(merged_inner))
+        _save_incremental_state(state_dir, state, new_hashes, df_cleaned, merged_inner)
+        return merged_inner
+
+    old_hashes = cache.load_frame('snapshot', state_dir).set_index('movie_key')['row_hash']
+    cleaned_old = cache.load_frame('cleaned', state_dir)
+    merged_old = cache.load_frame('merged_inner', state_dir)
+
+    # added or changed movies, and movies that left the snapshot
+    previous = old_hashes.reindex(new_hashes.index)
+    delta_keys = new_hashes.index[previous.isna().values | (previous.values != new_hashes.values)]
+    stale_keys = delta_keys.union(old_hashes.index.difference(new_hashes.index))
+
+    movie_keys = imdb_keys.encode(movie_data_orig['imdb_id'])
+    delta_rows = movie_data_orig[movie_keys.isin(delta_keys).values]
+    cleaned_delta = clean_movies(delta_rows, params)
+    df_cleaned = _concat(cleaned_old[~cleaned_old['movie_key'].isin(stale_keys)], cleaned_delta)
+
+    if old_state['imdb'] == dump_hashes:
+        merged_delta = enrich(cleaned_delta, params, verbose)
+        merged_inner = _concat(merged_old[~merged_old['movie_key'].isin(stale_keys)], merged_delta)
+    else:
+        # an IMDb dump changed, every kept movie may have new ratings/directors
+        merged_inner = enrich(df_cleaned, params, verbose)
+
+    if verbose:
+        print("incremental ETL: %d added/changed, %d removed, %d raw rows reprocessed, IMDb %s"
+              % (len(delta_keys), len(stale_keys) - len(delta_keys), len(delta_rows),
+                 'unchanged' if old_state['imdb'] == dump_hashes else 're-enriched'))
+    _save_incremental_state(state_dir, state, new_hashes, df_cleaned, merged_inner)
+    return merged_inner
+
+
+def load_merged_inner(params=CLEANING_PARAMS, use_cache=True, incremental=False, cache_dir=cache.CACHE_DIR):
+    '''
+    Returns the cleaned merged_inner frame
+    The frame is cached in a columnar file keyed by the content of the source
+    files (for a dump deleted after the IMDb store was built, the sha1 the
+    store recorded), the cleaning parameters and ETL_VERSION; when none of
+    these changed the ETL is skipped and the cached frame is loaded instead
+    :param incremental: on a cache miss, update the stored dataset with
+                        update_incremental instead of rerunning the whole ETL
+    :return: merged_inner frame
+    '''
+    build_frame = update_incremental if incremental else run_etl
+    if not use_cache:
+        return build_frame(params)
+
+    files = imdb_files()
+    hashes = {files[table]: sha1 for table, sha1 in imdb_hashes().items()}
+    key = cache.dataset_key(source_files(), dict(params, etl_version=ETL_VERSION), cache_dir, hashes)
+    merged_inner = cache.load_frame(key, cache_dir)
+    if merged_inner is None:
+        merged_inner = build_frame(params)
+        cache.save_frame(merged_inner, key, cache_dir)
+    return merged_inner
+
+
+if __name__ == '__main__':
+    # nightly refresh: python etl.py
+    load_merged_inner(incremental=True)
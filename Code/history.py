@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+import dates
+
+#::------------------------------------------------------------------------
+# Track record of the director and of the production company
+# For every movie: how many movies the director (company) released before
+# it, their success rate, and the same over the last WINDOW_YEARS only.
+# Only labeled movies released strictly before the release_date count, a
+# movie never sees its own target or the target of a later one; movies
+# without a New_status (new releases to score) get features but add nothing
+# to the track record of the others.
+# The frame is sorted once by (group, release_date); every count and sum is
+# then a difference of cumulative sums between two positions found with
+# np.searchsorted, so the cost is one sort, linear in the number of movies.
+#::------------------------------------------------------------------------
+
+GROUPS = ['Director', 'Production_Company']
+TARGET = 'New_status'
+WINDOW_YEARS = 5
+# weight, in movies, of the success rate of all earlier movies in the rate of a group
+PRIOR_WEIGHT = 5
+# success rate before the first labeled movie, when there is no earlier rate to smooth towards
+PRIOR_RATE = 0.5
+
+FEATURE_COLUMNS = ['%s_%s' % (group, stat) for group in GROUPS
+                   for stat in ('prior_films', 'prior_rate', 'recent_films', 'recent_rate')]
+
+
+def _prior_sums(codes, days, y, window_days=None):
+    '''
+    Count and target sum of the earlier labeled rows of the same group
+    :param codes: int group of every row, -1 when missing
+    :param days: int day of every row
+    :param y: float target of every row, NaN when unlabeled (weight 0)
+    :param window_days: only count the rows of the last window_days days
+    :return: counts, sums aligned on the rows (0 where the group or day is missing)
+    '''
+    counts = np.zeros(len(codes), dtype=np.int64)
+    sums = np.zeros(len(codes))
+    valid = np.flatnonzero(codes >= 0)
+    if len(valid) == 0:
+        return counts, sums
+
+    # (group, day) packed in one sortable int64
+    first_day = days[valid].min()
+    span = days[valid].max() - first_day + 1
+    key = codes[valid] * span + (days[valid] - first_day)
+    order = np.argsort(key, kind='mergesort')
+    key = key[order]
+    # the unlabeled rows count for nothing, a NaN would spread to every later position of the cumsum
+    labeled = ~np.isnan(y[valid][order])
+    cumsum = np.concatenate([[0.0], np.cumsum(np.where(labeled, y[valid][order], 0.0))])
+    cumcount = np.concatenate([[0], np.cumsum(labeled)])
+
+    # first row of the same (group, day): everything before it in the group is strictly earlier
+    end = np.searchsorted(key, key, side='left')
+    group_start = np.searchsorted(key, key // span * span, side='left')
+    start = group_start
+    if window_days is not None:
+        start = np.maximum(np.searchsorted(key, key - window_days, side='left'), group_start)
+
+    counts[valid[order]] = cumcount[end] - cumcount[start]
+    sums[valid[order]] = cumsum[end] - cumsum[start]
+    return counts, sums
+
+
+def history_features(df, groups=GROUPS, date='release_date', target=TARGET, window_years=WINDOW_YEARS):
+    '''
+    Leak free track record of every group of every movie
+    The rates are smoothed towards the success rate of all the movies released
+    before, so a first film gets the rate of the industry at that time
+    (PRIOR_RATE before the first labeled movie)
+    :param df: frame with the groups and the release date; the target may be
+               missing (NaN, or no target column) for the movies to score
+    :return: DataFrame with FEATURE_COLUMNS aligned on df
+    '''
+    release = dates.parse_dates(df[date])
+    day = np.zeros(len(df), dtype=np.int64)
+    known = release.notna().values
+    day[known] = release.values[known].astype('datetime64[D]').astype(np.int64)
+    y = np.asarray(df[target], dtype=np.float64) if target in df else np.full(len(df), np.nan)
+
+    # success rate of every earlier movie, one single group
+    everyone = np.where(known, 0, -1)
+    all_counts, all_sums = _prior_sums(everyone, day, y)
+    # the movies up to the first labeled release day have no earlier rate
+    overall = np.where(all_counts > 0, all_sums / np.maximum(all_counts, 1), PRIOR_RATE)
+
+    features = {}
+    for group in groups:
+        codes = pd.factorize(df[group])[0]
+        codes = np.where(known, codes, -1)
+        for name, window in (('prior', None), ('recent', int(window_years * 365.25))):
+            counts, sums = _prior_sums(codes, day, y, window)
+            features['%s_%s_films' % (group, name)] = counts
+            features['%s_%s_rate' % (group, name)] = (sums + PRIOR_WEIGHT * overall) / (counts + PRIOR_WEIGHT)
+    return pd.DataFrame(features, index=df.index)
+
+
+def add_history_features(df, **kwargs):
+    '''
+    df with the history_features columns added
+    '''
+    return df.assign(**history_features(df, **kwargs))
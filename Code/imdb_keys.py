@@ -0,0 +1,34 @@
+import pandas as pd
+
+#::------------------------------------------------------------------------
+# Integer surrogate keys for IMDb ids
+# 'tt0114709' (title, tconst/imdb_id) and 'nm0000005' (person, nconst) are
+# encoded as int64 (114709, 5) when the data is loaded. Joins, semi-joins
+# and dedup run on the integers, the strings are only rebuilt for display.
+#::------------------------------------------------------------------------
+
+TITLE_PREFIX = 'tt'
+PERSON_PREFIX = 'nm'
+
+
+def encode(ids):
+    '''
+    'tt0114709' -> 114709
+    :param ids: iterable of IMDb id strings
+    :return: Int64 series, <NA> for missing or malformed ids (e.g. a comma
+             separated list of ids)
+    '''
+    ids = pd.Series(ids, dtype=object)
+    return pd.to_numeric(ids.str.slice(2), errors='coerce').astype('Int64')
+
+
+def decode(keys, prefix=TITLE_PREFIX):
+    '''
+    114709 -> 'tt0114709'
+    IMDb ids have at least 7 digits, newer ones have 8
+    :param keys: integer keys
+    :param prefix: TITLE_PREFIX or PERSON_PREFIX
+    :return: series of id strings
+    '''
+    keys = pd.Series(keys)
+    return prefix + keys.astype('int64').astype(str).str.zfill(7)
@@ -0,0 +1,182 @@
+import gzip
+import io
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+import pandas as pd
+
+import directors
+import imdb_keys
+import schemas
+
+#::------------------------------------------------------------------------
+# Streaming loader for the IMDb dumps (title_crew, name_basics, title_ratings,
+# title_year). The dumps hold every title/person known to IMDb while the
+# project only needs the ~2k movies left after cleaning movies_metadata.csv,
+# so the files are read in chunks and every chunk is semi-joined against the
+# wanted keys before it is kept. Peak memory is one chunk plus the result,
+# whatever the size of the dump. tconst/nconst are encoded to int64 keys
+# (see imdb_keys.py) as they are read.
+# The dumps can be read as published by IMDb (title.crew.tsv.gz, ...), they
+# are decompressed on the fly by a background thread feeding the parser.
+#::------------------------------------------------------------------------
+
+CHUNK_SIZE = 500000
+# chunks parsed ahead while the wanted keys are still being computed, see read_filtered
+BUFFER_CHUNKS = 4
+# gzip decompression: size of a decompressed block, and blocks queued ahead of the parser
+DECOMPRESS_BLOCK = 1 << 20
+DECOMPRESS_AHEAD = 16
+
+
+def dump_path(path):
+    '''
+    Finds a dump on disk: path itself, path.gz, or the name IMDb publishes it
+    under ('title_crew.tsv' -> 'title.crew.tsv.gz')
+    :return: the existing file, path when none exists
+    '''
+    folder, name = os.path.split(path)
+    for candidate in [path, path + '.gz', os.path.join(folder, name.replace('_', '.') + '.gz')]:
+        if os.path.exists(candidate):
+            return candidate
+    return path
+
+
+class GzipStream(io.RawIOBase):
+    #::--------------------------------------------------------
+    # Read-only stream of the decompressed content of a .gz file
+    # A daemon thread decompresses blocks into a bounded queue
+    # (zlib releases the GIL), so decompression overlaps with the
+    # parsing in the reading thread and no plain copy of the dump
+    # is ever written to disk. Errors of the decompressing thread
+    # are raised in the reader.
+    #::--------------------------------------------------------
+    def __init__(self, path):
+        super(GzipStream, self).__init__()
+        self._blocks = queue.Queue(DECOMPRESS_AHEAD)
+        self._block = memoryview(b'')
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._decompress, args=(path,), daemon=True)
+        self._thread.start()
+
+    def _decompress(self, path):
+        try:
+            with gzip.open(path, 'rb') as f:
+                for block in iter(lambda: f.read(DECOMPRESS_BLOCK), b''):
+                    if self._stop.is_set():
+                        return
+                    self._blocks.put(block)
+            self._blocks.put(None)
+        except Exception as e:
+            self._blocks.put(e)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self._block:
+            item = self._blocks.get()
+            if item is None:
+                self._blocks.put(None)      # stay at end of file for the next read
+                return 0
+            if isinstance(item, Exception):
+                raise item
+            self._block = memoryview(item)
+        n = min(len(buffer), len(self._block))
+        buffer[:n] = self._block[:n]
+        self._block = self._block[n:]
+        return n
+
+    def close(self):
+        # unblock the decompressing thread if the reader stops early
+        self._stop.set()
+        while not self._blocks.empty():
+            self._blocks.get_nowait()
+        super(GzipStream, self).close()
+
+
+def open_dump(path):
+    #::--------------------------------------------------------
+    # Binary file object of a plain or gzipped dump
+    #::--------------------------------------------------------
+    if path.endswith('.gz'):
+        return io.BufferedReader(GzipStream(path), DECOMPRESS_BLOCK)
+    return open(path, 'rb')
+
+
+def _semi_join(chunk, chunk_keys, keys, key_column):
+    #::--------------------------------------------------------
+    # Rows of chunk whose encoded key is in keys, with the key
+    # column replaced by its int64 encoding
+    #::--------------------------------------------------------
+    wanted = chunk_keys.isin(keys).values
+    return chunk[wanted].assign(**{key_column: chunk_keys[wanted].astype('int64').values})
+
+
+def read_filtered(path, key_column, keys, chunksize=CHUNK_SIZE, buffer_chunks=BUFFER_CHUNKS, **read_kwargs):
+    '''
+    Reads the rows of a tsv file whose key_column is in keys
+    :param path: tsv file, plain or .gz
+    :param key_column: id column matched against keys (tconst, nconst),
+                       returned encoded as int64
+    :param keys: wanted integer keys, or a concurrent.futures.Future of them.
+                 With a future the file is parsed while the keys are computed
+                 elsewhere, keeping at most buffer_chunks unfiltered chunks
+                 before waiting for them
+    :param chunksize: number of rows parsed at a time
+    :param read_kwargs: options for pd.read_csv, see schemas.read_kwargs
+    :return: DataFrame with the matching rows only
+    '''
+    wanted_keys = None if isinstance(keys, Future) else pd.Index(keys).unique()
+
+    kept = []
+    pending = []
+    with open_dump(path) as f:
+        for chunk in pd.read_csv(f, chunksize=chunksize, **read_kwargs):
+            chunk_keys = imdb_keys.encode(chunk[key_column])
+            if wanted_keys is None:
+                if not keys.done() and len(pending) < buffer_chunks:
+                    pending.append((chunk, chunk_keys))
+                    continue
+                wanted_keys = pd.Index(keys.result()).unique()
+            kept.extend(_semi_join(c, ck, wanted_keys, key_column) for c, ck in pending)
+            pending = []
+            kept.append(_semi_join(chunk, chunk_keys, wanted_keys, key_column))
+
+    if pending:
+        # the whole file fit in the buffer
+        wanted_keys = pd.Index(keys.result()).unique()
+        kept.extend(_semi_join(c, ck, wanted_keys, key_column) for c, ck in pending)
+
+    if not kept:
+        empty = pd.read_csv(path, nrows=0, **read_kwargs)
+        return empty.astype({key_column: 'int64'})
+    return pd.concat(kept, ignore_index=True)
+
+
+def director_ids(dir_id_imdb):
+    #::--------------------------------------------------------
+    # Integer nconst of every director listed in title_crew,
+    # the directors field is a comma separated list
+    #::--------------------------------------------------------
+    return directors.director_edges(dir_id_imdb)['nconst'].unique()
+
+
+def load_imdb_tables(imdb_ids, crew_file, names_file, ratings_file, year_file, chunksize=CHUNK_SIZE):
+    '''
+    Loads the four IMDb tables restricted to the movies in imdb_ids
+    name_basics is restricted to the directors of those movies
+    :param imdb_ids: integer title keys
+    :return: dir_id_imdb, dir_name_imdb, ratings_imdb, releaseYr_imdb
+    '''
+    dir_id_imdb = read_filtered(crew_file, 'tconst', imdb_ids, chunksize,
+                                **schemas.read_kwargs(schemas.TITLE_CREW))
+    dir_name_imdb = read_filtered(names_file, 'nconst', director_ids(dir_id_imdb), chunksize,
+                                  **schemas.read_kwargs(schemas.NAME_BASICS))
+    ratings_imdb = read_filtered(ratings_file, 'tconst', imdb_ids, chunksize,
+                                 **schemas.read_kwargs(schemas.TITLE_RATINGS))
+    releaseYr_imdb = read_filtered(year_file, 'tconst', imdb_ids, chunksize,
+                                   **schemas.read_kwargs(schemas.TITLE_YEAR))
+    return dir_id_imdb, dir_name_imdb, ratings_imdb, releaseYr_imdb
@@ -0,0 +1,141 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+import cache
+import imdb_keys
+import imdb_loader
+import schemas
+
+#::------------------------------------------------------------------------
+# Persistent indexed store of the IMDb dimensions
+# The IMDb dumps are converted once into a SQLite file with one table per
+# dump, keyed by the integer part of tconst/nconst ('tt0114709' -> 114709).
+# Enrichment then becomes indexed point lookups for the few thousand wanted
+# titles instead of a parse of the full dumps. The sha1 of the dump each
+# table was built from is kept in the store, so a refreshed dump only
+# rebuilds its own table, and a dump deleted after the build is still
+# identified by it (etl.imdb_hashes).
+#
+# Build / refresh from the command line:  python imdb_store.py
+#::------------------------------------------------------------------------
+
+STORE_FILE = os.path.join(cache.CACHE_DIR, 'imdb.sqlite')
+
+# table name -> (default dump file, read schema, key column, sql column definitions)
+TABLES = {
+    'crew': ('title_crew.tsv', schemas.TITLE_CREW, 'tconst',
+             ['tconst INTEGER PRIMARY KEY', 'directors TEXT']),
+    'names': ('name_basics.tsv', schemas.NAME_BASICS, 'nconst',
+              ['nconst INTEGER PRIMARY KEY', 'primaryName TEXT']),
+    'ratings': ('title_ratings.tsv', schemas.TITLE_RATINGS, 'tconst',
+                ['tconst INTEGER PRIMARY KEY', 'averageRating REAL', 'numVotes INTEGER']),
+    'years': ('title_year.tsv', schemas.TITLE_YEAR, 'tconst',
+              ['tconst INTEGER PRIMARY KEY', 'startYear INTEGER']),
+}
+
+BUILD_CHUNK_SIZE = 500000
+
+
+def connect(store_file=STORE_FILE):
+    con = sqlite3.connect(store_file)
+    con.execute('CREATE TABLE IF NOT EXISTS sources (name TEXT PRIMARY KEY, sha1 TEXT)')
+    return con
+
+
+def build_table(con, table, tsv_path, chunksize=BUILD_CHUNK_SIZE):
+    '''
+    (Re)builds one table of the store from its dump in a single transaction
+    :param con: sqlite connection
+    :param table: key of TABLES
+    :param tsv_path: dump file, plain or .gz
+    :return: None
+    '''
+    _, schema, key_column, columns = TABLES[table]
+    names = [c.split()[0] for c in columns]
+    insert = 'INSERT OR REPLACE INTO {} VALUES ({})'.format(table, ', '.join('?' * len(names)))
+
+    with con:
+        con.execute('DROP TABLE IF EXISTS {}'.format(table))
+        con.execute('CREATE TABLE {} ({}) WITHOUT ROWID'.format(table, ', '.join(columns)))
+
+        with imdb_loader.open_dump(tsv_path) as f:
+            for chunk in pd.read_csv(f, chunksize=chunksize, **schemas.read_kwargs(schema)):
+                chunk[key_column] = imdb_keys.encode(chunk[key_column]).values
+                chunk = chunk[chunk[key_column].notna()][names]
+                # sqlite wants python None for missing values
+                chunk = chunk.astype(object).where(chunk.notna(), None)
+                con.executemany(insert, chunk.itertuples(index=False, name=None))
+
+        con.execute('INSERT OR REPLACE INTO sources VALUES (?, ?)', (table, cache.file_hash(tsv_path)))
+
+
+def build_store(files=None, store_file=STORE_FILE):
+    '''
+    Builds the store, or refreshes the tables whose dump changed since the last build
+    :param files: dict table -> dump file, defaults to the files in TABLES
+    :return: list of the rebuilt tables
+    '''
+    files = files or {table: imdb_loader.dump_path(spec[0]) for table, spec in TABLES.items()}
+    os.makedirs(os.path.dirname(store_file) or '.', exist_ok=True)
+
+    con = connect(store_file)
+    built = dict(con.execute('SELECT name, sha1 FROM sources').fetchall())
+    rebuilt = []
+    for table, tsv_path in files.items():
+        if not os.path.exists(tsv_path):
+            continue
+        if built.get(table) != cache.file_hash(tsv_path):
+            build_table(con, table, tsv_path)
+            rebuilt.append(table)
+    con.close()
+    return rebuilt
+
+
+def source_hashes(store_file=STORE_FILE):
+    '''
+    :return: dict table -> sha1 of the dump the table was built from
+    '''
+    con = connect(store_file)
+    hashes = dict(con.execute('SELECT name, sha1 FROM sources').fetchall())
+    con.close()
+    return hashes
+
+
+def lookup(con, table, keys):
+    '''
+    Point lookup of integer keys in a table of the store
+    :return: DataFrame with the columns of the table
+    '''
+    _, _, key_column, _ = TABLES[table]
+    keys = pd.Index(keys).unique()
+
+    # the wanted keys go to a temporary table, the lookup is an indexed join
+    con.execute('CREATE TEMP TABLE IF NOT EXISTS wanted (key INTEGER PRIMARY KEY)')
+    con.execute('DELETE FROM wanted')
+    con.executemany('INSERT OR IGNORE INTO wanted VALUES (?)', ((int(k),) for k in keys))
+    df = pd.read_sql_query('SELECT t.* FROM {} t JOIN wanted w ON t.{} = w.key'.format(table, key_column), con)
+    return df.astype({key_column: 'int64'})
+
+
+def load_imdb_tables(imdb_ids, store_file=STORE_FILE):
+    '''
+    Same result as imdb_loader.load_imdb_tables, read from the store
+    :param imdb_ids: integer title keys
+    :return: dir_id_imdb, dir_name_imdb, ratings_imdb, releaseYr_imdb
+    '''
+    con = connect(store_file)
+    dir_id_imdb = lookup(con, 'crew', imdb_ids)
+    dir_name_imdb = lookup(con, 'names', imdb_loader.director_ids(dir_id_imdb))
+    ratings_imdb = lookup(con, 'ratings', imdb_ids)
+    releaseYr_imdb = lookup(con, 'years', imdb_ids)
+    con.close()
+
+    ratings_imdb = ratings_imdb.astype({'numVotes': 'int32'})
+    releaseYr_imdb = releaseYr_imdb.astype({'startYear': 'Int16'})
+    return dir_id_imdb, dir_name_imdb, ratings_imdb, releaseYr_imdb
+
+
+if __name__ == '__main__':
+    print('rebuilt tables:', build_store())
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+#::------------------------------------------------------------------------
+# Vectorized parser for the json-like columns of movies_metadata.csv
+# (genres, production_companies, ...). Each cell is a python repr of a list
+# of dicts such as  "[{'id': 16, 'name': 'Animation'}, {'id': 35, ...}]"
+# Instead of eval + apply(pd.Series) on every row, the name/id pairs are
+# pulled out with regular expressions in one pass over the *distinct*
+# strings only, and the result is broadcast back to the rows.
+#::------------------------------------------------------------------------
+
+# one {...} entry of the list: quoted strings (which may hold braces, e.g. a name 'Ré{x}') and any other
+# character but a quote or a brace, up to the closing brace
+ENTRY_PATTERN = r"""(\{(?:'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|[^'"{}])*\})"""
+# 'name' is single quoted unless the value itself contains a quote
+NAME_PATTERN = r"""'name':\s*(?:'(?P<sq>(?:[^'\\]|\\.)*)'|"(?P<dq>(?:[^"\\]|\\.)*)")"""
+ID_PATTERN = r"'id':\s*(?P<id>-?\d+)"
+
+
+def _unique_strings(values):
+    #::--------------------------------------------------------
+    # Memoization step: many rows share the same list (same studio,
+    # same genre combination), so everything below only runs on the
+    # distinct strings. codes maps each row to its distinct string,
+    # -1 for missing values.
+    #::--------------------------------------------------------
+    codes, uniques = pd.factorize(pd.Series(values))
+    return codes, pd.Series(np.asarray(uniques, dtype=object), dtype=object)
+
+
+def _entry_fields(entries):
+    #::--------------------------------------------------------
+    # Extracts id and name from a series of single '{...}' entries
+    #::--------------------------------------------------------
+    names = entries.str.extract(NAME_PATTERN)
+    name = names['sq'].fillna(names['dq'])
+    name = name.str.replace(r"\\(.)", r"\1", regex=True)     # undo repr escaping
+    ids = pd.to_numeric(entries.str.extract(ID_PATTERN)['id'], errors='coerce')
+    return pd.DataFrame({'id': ids.values, 'name': name.values})
+
+
+def _distinct_entries(values):
+    #::--------------------------------------------------------
+    # Parses every entry of the distinct strings
+    # codes: distinct string of every row, -1 for missing values
+    # fields: id/name of the entries, those of one string contiguous
+    # counts_u: number of entries of every distinct string
+    #::--------------------------------------------------------
+    codes, uniques = _unique_strings(values)
+    matches = uniques.str.extractall(ENTRY_PATTERN)[0]
+    fields = _entry_fields(matches)
+    counts_u = np.bincount(matches.index.get_level_values(0).values, minlength=len(uniques))
+    return codes, fields, counts_u
+
+
+def entry_offsets(values):
+    '''
+    Every entry of every cell in CSR layout, without expanding the rows
+    :param values: series of json-like strings, NaN allowed
+    :return: codes (distinct cell of every row, -1 for missing values),
+             indptr (the entries of distinct cell k are fields[indptr[k]:indptr[k + 1]]),
+             fields (DataFrame id, name)
+    '''
+    codes, fields, counts_u = _distinct_entries(pd.Series(values))
+    return codes, np.concatenate([[0], np.cumsum(counts_u)]), fields
+
+
+def first_entry(values):
+    '''
+    Returns the first (major) entry of every cell
+    :param values: series of json-like strings, NaN allowed
+    :return: DataFrame with columns id, name aligned on the index of values.
+             Rows with an empty or missing list get NaN
+    '''
+    values = pd.Series(values)
+    codes, uniques = _unique_strings(values)
+
+    fields = _entry_fields(uniques.str.extract(ENTRY_PATTERN, expand=False))
+    # append one all-NaN row so that code -1 (missing) maps onto it
+    fields = pd.concat([fields, pd.DataFrame({'id': [np.nan], 'name': [np.nan]})], ignore_index=True)
+    result = fields.iloc[np.where(codes < 0, len(uniques), codes)]
+    result.index = values.index
+    return result
+
+
+def all_entries(values):
+    '''
+    Returns every entry of every cell in long format
+    :param values: series of json-like strings, NaN allowed
+    :return: DataFrame with columns row (position of the cell in values),
+             ordinal (position of the entry inside the cell), id and name.
+             Rows are sorted by row then ordinal, so the entries of one cell
+             are contiguous and offsets can be taken with np.bincount(row)
+    '''
+    values = pd.Series(values)
+    codes, fields, counts_u = _distinct_entries(values)
+
+    # first entry position of every distinct string
+    starts_u = np.cumsum(counts_u) - counts_u
+
+    # broadcast back to the rows without any python loop
+    valid = codes >= 0
+    row_counts = np.where(valid, counts_u[np.where(valid, codes, 0)], 0)
+    row_starts = np.where(valid, starts_u[np.where(valid, codes, 0)], 0)
+    rows = np.repeat(np.arange(len(values)), row_counts)
+    ordinal = np.arange(row_counts.sum()) - np.repeat(np.cumsum(row_counts) - row_counts, row_counts)
+    entry_pos = np.repeat(row_starts, row_counts) + ordinal
+
+    result = fields.iloc[entry_pos].reset_index(drop=True)
+    result.insert(0, 'ordinal', ordinal)
+    result.insert(0, 'row', rows)
+    return result
@@ -0,0 +1,110 @@
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.metrics import accuracy_score, cohen_kappa_score, roc_auc_score
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+#::------------------------------------------------------------------------
+# Model zoo runner
+# The models of the project are fitted at the same time in a process pool
+# (joblib/loky, which does not re-run Project_Code.py in the workers). The
+# training and test matrices are sent once: joblib memory maps every array
+# above MAX_NBYTES, so the workers read the same read-only copy instead of
+# getting one each. Every fit gives one row of the results table:
+#       fit_seconds, predict_seconds, accuracy, roc_auc, kappa
+#::------------------------------------------------------------------------
+
+# the matrix a model is trained on:
+#   sparse       : the CSR matrix of preprocessing.py
+#   dense        : the same as a dense array (GaussianNB)
+#   standardized : scaled to unit variance (KNN), without centering which would make it dense;
+#                  the returned estimator includes the scaler and predicts on the sparse matrix
+#   native       : given to run_zoo, e.g. the categorical codes of boosting.native_matrix,
+#                  with its own target when its training rows are not oversampled
+MATRICES = ('sparse', 'dense', 'standardized', 'native')
+# arrays above this size are memory mapped for the workers
+MAX_NBYTES = '1M'
+RESULT_COLUMNS = ['fit_seconds', 'predict_seconds', 'accuracy', 'roc_auc', 'kappa']
+
+
+def spec(name, estimator, matrix='sparse'):
+    '''
+    One model of the zoo
+    :param name: row of the results table
+    :param estimator: unfitted scikit-learn classifier
+    :param matrix: one of MATRICES
+    '''
+    if matrix not in MATRICES:
+        raise ValueError("matrix must be one of %s, got %r" % (MATRICES, matrix))
+    return {'name': name, 'estimator': estimator, 'matrix': matrix}
+
+
+def _score(estimator, X):
+    #::--------------------------------------------------------
+    # score of the positive class for the AUC
+    #::--------------------------------------------------------
+    if hasattr(estimator, 'predict_proba'):
+        return estimator.predict_proba(X)[:, 1]
+    return estimator.decision_function(X)
+
+
+def _fit_one(model, X_train, X_test, y_train):
+    if model['matrix'] == 'dense':
+        X_train, X_test = X_train.toarray(), X_test.toarray()
+    estimator = model['estimator']
+
+    start = time.time()
+    estimator.fit(X_train, y_train)
+    fit_seconds = time.time() - start
+
+    start = time.time()
+    y_pred = estimator.predict(X_test)
+    predict_seconds = time.time() - start
+    return estimator, y_pred, _score(estimator, X_test), fit_seconds, predict_seconds
+
+
+def metrics_row(y_test, y_pred, y_score=None, fit_seconds=np.nan, predict_seconds=np.nan):
+    '''
+    One row of the results table, also for models fitted outside the zoo
+    :return: dict with RESULT_COLUMNS
+    '''
+    return {'fit_seconds': fit_seconds, 'predict_seconds': predict_seconds,
+            'accuracy': accuracy_score(y_test, y_pred),
+            'roc_auc': roc_auc_score(y_test, y_score) if y_score is not None else np.nan,
+            'kappa': cohen_kappa_score(y_test, y_pred)}
+
+
+def run_zoo(models, X_train, y_train, X_test, y_test, n_jobs=-1, native=None, native_target=None):
+    '''
+    Fits every model of models in parallel and scores it on the test set
+    :param models: list of spec(...)
+    :param n_jobs: worker processes, -1 for one per core
+    :param native: (train, test) matrices of the models with matrix='native'
+    :param native_target: target of the native training matrix, y_train when None
+    :return: results table (one row per model, RESULT_COLUMNS),
+             dict name -> fitted estimator, dict name -> test predictions
+    '''
+    # matrix -> (train, test, target of train)
+    matrices = {'sparse': (X_train, X_test, y_train), 'dense': (X_train, X_test, y_train)}
+    if any(model['matrix'] == 'standardized' for model in models):
+        scaler = StandardScaler(with_mean=False).fit(X_train)
+        matrices['standardized'] = (scaler.transform(X_train), scaler.transform(X_test), y_train)
+    if native is not None:
+        matrices['native'] = (native[0], native[1], y_train if native_target is None else native_target)
+    elif any(model['matrix'] == 'native' for model in models):
+        raise ValueError("models with matrix='native' need the native matrices")
+
+    fitted = Parallel(n_jobs=n_jobs, max_nbytes=MAX_NBYTES)(
+        delayed(_fit_one)(model, *matrices[model['matrix']]) for model in models)
+
+    rows, estimators, predictions = {}, {}, {}
+    for model, (estimator, y_pred, y_score, fit_seconds, predict_seconds) in zip(models, fitted):
+        rows[model['name']] = metrics_row(y_test, y_pred, y_score, fit_seconds, predict_seconds)
+        if model['matrix'] == 'standardized':
+            estimator = make_pipeline(scaler, estimator)
+        estimators[model['name']] = estimator
+        predictions[model['name']] = y_pred
+    return pd.DataFrame.from_dict(rows, orient='index')[RESULT_COLUMNS], estimators, predictions
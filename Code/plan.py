@@ -0,0 +1,89 @@
+#::------------------------------------------------------------------------
+# Small lazy query plan for the cleaning of a data frame
+# A plan is a list of steps, each declaring the columns it reads and writes:
+#       derive : computes/overwrites columns, must work row by row
+#       keep   : filters rows with a boolean mask
+# Nothing runs when the plan is built. Before execution every filter is
+# pushed up to just after the last step that writes one of the columns it
+# reads, so cheap numeric predicates run before the costly string parsing
+# and the parsing only touches the surviving rows.
+#::------------------------------------------------------------------------
+
+DERIVE = 'derive'
+KEEP = 'keep'
+
+
+class Step:
+    #::--------------------------------------------------------
+    # One node of the plan
+    #   fn     : df -> df for a derive step, df -> mask for a keep step
+    #   reads  : columns used by fn
+    #   writes : columns produced by a derive step
+    #::--------------------------------------------------------
+    def __init__(self, kind, name, fn, reads, writes=()):
+        self.kind = kind
+        self.name = name
+        self.fn = fn
+        self.reads = set(reads)
+        self.writes = set(writes)
+
+    def __repr__(self):
+        return '{}({})'.format(self.kind, self.name)
+
+
+def derive(name, fn, reads, writes):
+    return Step(DERIVE, name, fn, reads, writes)
+
+
+def keep(name, predicate, reads):
+    return Step(KEEP, name, predicate, reads)
+
+
+class Plan:
+    #::--------------------------------------------------------
+    # Steps in the order they were declared, optimized() gives
+    # the order they are executed in
+    #::--------------------------------------------------------
+    def __init__(self, steps):
+        self.steps = list(steps)
+
+    def optimized(self):
+        '''
+        Filter pushdown
+        Derive steps keep their relative order, every filter moves to the
+        earliest position after the steps producing its columns; filters
+        landing on the same position keep their declared order
+        :return: list of steps
+        '''
+        ordered = []
+        for step in self.steps:
+            if step.kind == DERIVE:
+                ordered.append(step)
+                continue
+
+            position = 0
+            for i, done in enumerate(ordered):
+                if done.kind == DERIVE and done.writes & step.reads:
+                    position = i + 1
+            while position < len(ordered) and ordered[position].kind == KEEP:
+                position += 1
+            ordered.insert(position, step)
+        return ordered
+
+    def explain(self):
+        #::--------------------------------------------------------
+        # Execution order, one line per step
+        #::--------------------------------------------------------
+        return ['{:2d} {:6s} {}'.format(i, step.kind, step.name) for i, step in enumerate(self.optimized())]
+
+    def execute(self, df):
+        '''
+        Runs the optimized plan on df
+        :return: the resulting frame
+        '''
+        for step in self.optimized():
+            if step.kind == KEEP:
+                df = df[step.fn(df).fillna(False).astype(bool).values]
+            else:
+                df = step.fn(df)
+        return df
@@ -0,0 +1,174 @@
+import hashlib
+import json
+
+import numpy as np
+from scipy import sparse
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.preprocessing import LabelEncoder, MinMaxScaler
+
+import encoders
+import history
+
+#::------------------------------------------------------------------------
+# Fitted preprocessing of the modeling features
+# MinMax scaling of the numeric columns, out-of-fold target encoding of the
+# high cardinality columns and sparse one-hot encoding of the other
+# categorical ones (see encoders.py), and the label encoding of New_status,
+# fitted once, with a hash of the fitted state. With
+# encoding='hashing' the production companies, directors and languages are
+# hashed into a fixed number of columns instead, for a catalogue whose
+# vocabulary keeps growing; the production_companies lists are hashed too
+# instead of multi-hot encoded, so no company adds a column. The modeling
+# section fits it and saves it with every registered model (registry.py);
+# the GUI fits its own on the training rows of its split at every click, so
+# the target encoding never sees the labels of its test rows.
+# Both turn a frame into the model matrix with one transform call, so new
+# data always gets the training columns.
+#::------------------------------------------------------------------------
+
+# with the track record of the director and of the company before the release (see history.py)
+NUMERIC = ['runtime', 'averageRating', 'budget', 'popularity'] + history.FEATURE_COLUMNS
+CATEGORICAL = ['Genre', 'release_month']
+# about 500 production companies and 1200 directors, a rate and a frequency column each instead of one-hot columns
+TARGET_ENCODED = ['Production_Company', 'Director']
+# json lists of movies_metadata, every genre and company of a movie (see encoders.MultiHotEncoder)
+MULTI_HOT = ['genres', 'production_companies']
+# the open ended vocabularies, hashed when ENCODING is 'hashing'
+HASHED = ['Production_Company', 'Director', 'original_language']
+# json list columns hashed instead of multi-hot encoded when ENCODING is 'hashing'
+HASHED_LISTS = ['production_companies']
+FEATURES = ['runtime', 'averageRating', 'budget', 'Genre', 'Production_Company', 'release_month', 'popularity', 'Director',
+            'original_language', 'genres', 'production_companies'] + history.FEATURE_COLUMNS
+# 'target': target encoding of TARGET_ENCODED, 'hashing': feature hashing of HASHED
+ENCODING = 'target'
+TARGET = 'New_status'
+
+MODEL_DIR = 'models'
+
+
+class MoviePreprocessor(BaseEstimator, TransformerMixin):
+    '''
+    Frame -> CSR matrix: the scaled numeric columns, the target encoded
+    columns, the one-hot columns, the multi-hot columns, then the hashed
+    columns
+    fit_transform gives the out-of-fold target encoding of the training rows,
+    transform the encoding fitted on all of them
+    :param numeric: columns scaled to [0, 1]
+    :param categorical: columns one-hot encoded
+    :param target_encoded: columns target encoded, see encoders.TargetEncoder
+    :param multi_hot: json list columns multi-hot encoded, see encoders.MultiHotEncoder
+    :param hashed: columns hashed, see encoders.HashingEncoder
+    :param hashed_lists: json list columns hashed, see encoders.HashingEncoder
+    :param min_frequency: see encoders.MIN_FREQUENCY
+    :param smoothing: see encoders.SMOOTHING
+    :param n_hash_features: see encoders.HASH_FEATURES
+    '''
+
+    def __init__(self, numeric=NUMERIC, categorical=CATEGORICAL, target_encoded=TARGET_ENCODED, multi_hot=MULTI_HOT,
+                 hashed=(), hashed_lists=(), min_frequency=encoders.MIN_FREQUENCY, smoothing=encoders.SMOOTHING,
+                 n_hash_features=encoders.HASH_FEATURES):
+        self.numeric = numeric
+        self.categorical = categorical
+        self.target_encoded = target_encoded
+        self.multi_hot = multi_hot
+        self.hashed = hashed
+        self.hashed_lists = hashed_lists
+        self.min_frequency = min_frequency
+        self.smoothing = smoothing
+        self.n_hash_features = n_hash_features
+
+    def fit(self, X, y):
+        self._fit(X, y)
+        return self
+
+    def _fit(self, X, y):
+        # fits every step, returns the encoded target
+        self.scaler_ = MinMaxScaler().fit(X[self.numeric].values.astype(float))
+        self.onehot_ = encoders.SparseOneHotEncoder(self.categorical, self.min_frequency).fit(X)
+        self.multi_hot_ = encoders.MultiHotEncoder(self.multi_hot, self.min_frequency).fit(X)
+        self.label_encoder_ = LabelEncoder().fit(np.asarray(y).ravel())
+        target = self.transform_target(y)
+        self.target_encoder_ = encoders.TargetEncoder(self.target_encoded, self.smoothing).fit(X, target)
+        self.hasher_ = encoders.HashingEncoder(list(self.hashed), self.n_hash_features, list(self.hashed_lists)).fit()
+        self.version_ = self._fitted_hash()
+        return target
+
+    def _assemble(self, X, target_encoded):
+        scaled = self.scaler_.transform(X[self.numeric].values.astype(float))
+        return sparse.hstack([sparse.csr_matrix(np.hstack([scaled, target_encoded])), self.onehot_.transform(X),
+                              self.multi_hot_.transform(X), self.hasher_.transform(X)], format='csr')
+
+    def transform(self, X):
+        return self._assemble(X, self.target_encoder_.transform(X))
+
+    def fit_transform(self, X, y):
+        target = self._fit(X, y)
+        return self._assemble(X, self.target_encoder_.fit_transform(X, target))
+
+    def transform_target(self, y):
+        return self.label_encoder_.transform(np.asarray(y).ravel())
+
+    def get_feature_names_out(self, input_features=None):
+        return np.concatenate([np.array(self.numeric, dtype=object), self.target_encoder_.get_feature_names_out(),
+                               self.onehot_.get_feature_names_out(), self.multi_hot_.get_feature_names_out(),
+                               self.hasher_.get_feature_names_out()])
+
+    def feature_columns(self, features):
+        '''
+        Positions of the output columns coming from the input columns features,
+        e.g. the features checked in the GUI
+        :return: int array
+        '''
+        # input column of every output column: a rate and a frequency per target encoded column,
+        # the levels + 'other' per one-hot or multi-hot encoded column, a block per hashed column
+        owner = (self.numeric + [col for col in self.target_encoded for _ in range(2)]
+                 + [col for col in self.categorical for _ in range(len(self.onehot_.vocabulary_[col]) + 1)]
+                 + [col for col in self.multi_hot for _ in range(len(self.multi_hot_.vocabulary_[col]) + 1)]
+                 + [col for col in list(self.hashed) + list(self.hashed_lists) for _ in range(self.n_hash_features)])
+        return np.flatnonzero(np.isin(np.array(owner, dtype=object), features))
+
+    def _fitted_hash(self):
+        #::--------------------------------------------------------
+        # sha1 of the parameters and of everything learned in fit
+        #::--------------------------------------------------------
+        sha1 = hashlib.sha1()
+        sha1.update(json.dumps([self.numeric, self.categorical, self.target_encoded, list(self.multi_hot),
+                                list(self.hashed), list(self.hashed_lists), self.min_frequency, self.smoothing,
+                                self.n_hash_features]).encode())
+        sha1.update(self.scaler_.data_min_.tobytes())
+        sha1.update(self.scaler_.data_max_.tobytes())
+        for col in self.categorical:
+            sha1.update(json.dumps(list(self.onehot_.vocabulary_[col])).encode())
+        for col in self.multi_hot:
+            sha1.update(json.dumps(list(self.multi_hot_.vocabulary_[col])).encode())
+        for col in self.target_encoded:
+            sha1.update(json.dumps(list(self.target_encoder_.levels_[col])).encode())
+            sha1.update(self.target_encoder_.counts_[col].tobytes())
+            sha1.update(self.target_encoder_.sums_[col].tobytes())
+        sha1.update(json.dumps([str(c) for c in self.label_encoder_.classes_]).encode())
+        return sha1.hexdigest()[:12]
+
+
+def make_pipeline(encoding=ENCODING):
+    '''
+    Unfitted preprocessing for one of the encodings of the high cardinality columns
+    :param encoding: 'target' or 'hashing', see ENCODING
+    :return: MoviePreprocessor
+    '''
+    if encoding == 'target':
+        return MoviePreprocessor()
+    if encoding == 'hashing':
+        return MoviePreprocessor(target_encoded=[], multi_hot=[col for col in MULTI_HOT if col not in HASHED_LISTS],
+                                 hashed=HASHED, hashed_lists=HASHED_LISTS)
+    raise ValueError("encoding must be 'target' or 'hashing', got %r" % (encoding,))
+
+
+def fit_pipeline(df, encoding=ENCODING):
+    '''
+    Fits the preprocessing on df (features and New_status)
+    :param encoding: see make_pipeline
+    :return: the fitted MoviePreprocessor, the out-of-fold matrix of df
+    '''
+    pipeline = make_pipeline(encoding)
+    X = pipeline.fit_transform(df[FEATURES], df[TARGET])
+    return pipeline, X
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+import uuid
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+import boosting
+import dates
+import history
+import preprocessing
+
+#::------------------------------------------------------------------------
+# Local registry of the fitted models
+# Every registered model gets its own directory REGISTRY_DIR/<model id>:
+#       model.joblib     : the fitted estimator and its preprocessing pipeline,
+#                          uncompressed so that the arrays load memory mapped
+#       catalogue.joblib : the labeled movies the track records (history.py)
+#                          of the training rows were computed on
+#       meta.json        : name, creation time, model_zoo matrix, params,
+#                          metrics, timing, hash of the training data, version
+#                          of the pipeline, feature names and vocabularies
+# A model registered again with the same name and training data replaces
+# the previous entry, so the registry only grows with new data or models.
+# load() gives the latest model (of a name) or the one of an id without
+# any refit; score_batch() scores a frame of new movies with it.
+#       python registry.py new_movies.csv [model id]
+#::------------------------------------------------------------------------
+
+REGISTRY_DIR = os.path.join(preprocessing.MODEL_DIR, 'registry')
+MODEL_FILE = 'model.joblib'
+CATALOGUE_FILE = 'catalogue.joblib'
+META_FILE = 'meta.json'
+# columns of the movies to score; release_month and the track records are derived in score_batch
+INPUT_COLUMNS = ([col for col in preprocessing.FEATURES if col not in history.FEATURE_COLUMNS + ['release_month']]
+                 + ['release_date'])
+# columns of the catalogue the track records are computed against
+CATALOGUE_COLUMNS = history.GROUPS + ['release_date', history.TARGET]
+# columns of the model_zoo results table kept as timing, the others are metrics
+TIMING_COLUMNS = ['fit_seconds', 'predict_seconds']
+
+
+def data_hash(X, y):
+    '''
+    sha1 of a training matrix (CSR or dense) and of its target
+    :return: 12 hex characters
+    '''
+    sha1 = hashlib.sha1()
+    if sparse.issparse(X):
+        X = sparse.csr_matrix(X)
+        X.sort_indices()
+        for part in (X.data, X.indices, X.indptr):
+            sha1.update(np.ascontiguousarray(part).tobytes())
+    else:
+        sha1.update(np.ascontiguousarray(X).tobytes())
+    sha1.update(str(X.shape).encode())
+    sha1.update(np.ascontiguousarray(y).tobytes())
+    return sha1.hexdigest()[:12]
+
+
+def _vocabulary(pipeline):
+    # levels learned by every encoder of the pipeline, column -> list
+    vocabulary = {}
+    for levels in (pipeline.onehot_.vocabulary_, pipeline.multi_hot_.vocabulary_, pipeline.target_encoder_.levels_):
+        vocabulary.update({col: [str(level) for level in values] for col, values in levels.items()})
+    return vocabulary
+
+
+def _model_id(name):
+    # name, creation time and a random suffix, e.g. rf-20200501-183012-1f3a9c2e
+    slug = re.sub('[^a-z0-9]+', '-', name.lower()).strip('-')
+    return '%s-%s-%s' % (slug, time.strftime('%Y%m%d-%H%M%S'), uuid.uuid4().hex[:8])
+
+
+def register(name, estimator, pipeline, X_train, y_train, catalogue, matrix='sparse', metrics=None,
+             path=REGISTRY_DIR):
+    '''
+    Saves a fitted model with everything needed to reuse it, in place of
+    the entry of the same name and training data if there is one
+    :param name: model name, e.g. a row of the model_zoo results table
+    :param estimator: fitted scikit-learn classifier
+    :param pipeline: the fitted preprocessing.MoviePreprocessor of X_train
+    :param catalogue: labeled movies (CATALOGUE_COLUMNS) the track records of
+                      the training rows were computed on, for score_batch
+    :param matrix: model_zoo matrix the estimator predicts on
+    :param metrics: row of the model_zoo results table (dict or Series), split into metrics and timing
+    :return: model id
+    '''
+    metrics = {} if metrics is None else {col: float(value) for col, value in dict(metrics).items()}
+    model_id = _model_id(name)
+    meta = {'id': model_id,
+            'name': name,
+            'created': time.time(),
+            'matrix': matrix,
+            'estimator': type(estimator).__name__,
+            'params': estimator.get_params(deep=False),
+            'metrics': {col: value for col, value in metrics.items() if col not in TIMING_COLUMNS},
+            'timing': {col: value for col, value in metrics.items() if col in TIMING_COLUMNS},
+            'training_rows': int(X_train.shape[0]),
+            'catalogue_rows': len(catalogue),
+            'data_hash': data_hash(X_train, y_train),
+            'pipeline_version': pipeline.version_,
+            'feature_names': [str(feature) for feature in pipeline.get_feature_names_out()],
+            'vocabulary': _vocabulary(pipeline)}
+
+    # written next to the registry then renamed, a model directory is always complete
+    tmp_dir = os.path.join(path, model_id + '.tmp')
+    os.makedirs(tmp_dir)
+    start = time.time()
+    joblib.dump({'estimator': estimator, 'pipeline': pipeline}, os.path.join(tmp_dir, MODEL_FILE))
+    joblib.dump(catalogue[CATALOGUE_COLUMNS].reset_index(drop=True), os.path.join(tmp_dir, CATALOGUE_FILE))
+    meta['timing']['save_seconds'] = time.time() - start
+    with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+        # params that are not json (estimators of an ensemble) are saved as their repr
+        json.dump(meta, f, indent=2, default=repr)
+
+    # the same model refitted on the same data replaces its previous entry
+    previous = list_models(name, path)
+    os.replace(tmp_dir, os.path.join(path, model_id))
+    for old_id in previous['id'][previous['data_hash'] == meta['data_hash']]:
+        delete(old_id, path)
+    return model_id
+
+
+def list_models(name=None, path=REGISTRY_DIR):
+    '''
+    :param name: only the models of that name
+    :return: DataFrame, one row per model (id, name, created, matrix, data_hash and the metrics), oldest first
+    '''
+    rows = []
+    if os.path.isdir(path):
+        for model_id in os.listdir(path):
+            meta_path = os.path.join(path, model_id, META_FILE)
+            if model_id.endswith('.tmp') or not os.path.exists(meta_path):
+                continue
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if name is None or meta['name'] == name:
+                rows.append(dict({key: meta[key] for key in ('id', 'name', 'created', 'matrix', 'data_hash')},
+                                 **meta['metrics']))
+    columns = ['id', 'name', 'created', 'matrix', 'data_hash']
+    models = pd.DataFrame(rows, columns=columns + sorted({col for row in rows for col in row} - set(columns)))
+    return models.sort_values('created', kind='mergesort').reset_index(drop=True)
+
+
+def load(model_id=None, name=None, mmap_mode='r', path=REGISTRY_DIR):
+    '''
+    Loads a registered model without refitting it
+    :param model_id: id given by register, the latest model when None
+    :param name: with model_id None, the latest model of that name
+    :param mmap_mode: arrays of the estimator are memory mapped ('r'), None reads them in memory
+    :return: fitted estimator, fitted pipeline, meta dict
+    '''
+    if model_id is None:
+        models = list_models(name, path)
+        if len(models) == 0:
+            raise ValueError("no registered model%s in %s" % ('' if name is None else ' named %r' % name, path))
+        model_id = models['id'].iloc[-1]
+    model_dir = os.path.join(path, model_id)
+    if not os.path.exists(os.path.join(model_dir, META_FILE)):
+        raise ValueError("no registered model %r in %s" % (model_id, path))
+    with open(os.path.join(model_dir, META_FILE)) as f:
+        meta = json.load(f)
+    saved = joblib.load(os.path.join(model_dir, MODEL_FILE), mmap_mode=mmap_mode)
+    if saved['pipeline']._fitted_hash() != meta['pipeline_version']:
+        raise ValueError("the pipeline of %s does not match its version hash %s" % (model_id, meta['pipeline_version']))
+    return saved['estimator'], saved['pipeline'], meta
+
+
+def delete(model_id, path=REGISTRY_DIR):
+    shutil.rmtree(os.path.join(path, model_id))
+
+
+def load_catalogue(model_id, path=REGISTRY_DIR):
+    '''
+    :return: the labeled catalogue saved with the model, CATALOGUE_COLUMNS
+    '''
+    return joblib.load(os.path.join(path, model_id, CATALOGUE_FILE))
+
+
+def model_features(df, catalogue):
+    '''
+    preprocessing.FEATURES of new movies: release_month from release_date,
+    and the track records of their director and company in the catalogue
+    :param df: frame with INPUT_COLUMNS, New_status is not needed
+    :param catalogue: labeled movies, see load_catalogue
+    :return: frame aligned on df
+    '''
+    missing = [col for col in INPUT_COLUMNS if col not in df]
+    if missing:
+        raise ValueError("the movies to score have no column %s" % ', '.join(missing))
+    movies = dates.add_date_features(df[INPUT_COLUMNS])
+    # the new movies are unlabeled: they get the track record of the earlier catalogue movies and add nothing to it
+    both = pd.concat([catalogue.assign(release_date=dates.parse_dates(catalogue['release_date'])),
+                      movies[history.GROUPS + ['release_date']].assign(**{history.TARGET: np.nan})],
+                     ignore_index=True)
+    records = history.history_features(both).iloc[len(catalogue):]
+    return movies.assign(**{col: records[col].values for col in history.FEATURE_COLUMNS})[preprocessing.FEATURES]
+
+
+def model_matrix(pipeline, X, matrix):
+    '''
+    The matrix a registered model predicts on from the CSR matrix of its pipeline
+    '''
+    if matrix == 'dense':
+        return X.toarray()
+    if matrix == 'native':
+        return boosting.native_matrix(pipeline, X)[0]
+    # 'standardized' estimators of model_zoo include their scaler
+    return X
+
+
+def score_batch(df, model_id=None, name=None, path=REGISTRY_DIR):
+    '''
+    Predictions of a registered model for a frame of movies, one transform
+    and one predict_proba call for the whole frame
+    :param df: one row per movie with INPUT_COLUMNS:
+               runtime, averageRating, budget, popularity (numbers),
+               Genre, Production_Company, Director, original_language (strings),
+               genres, production_companies (json-like lists of movies_metadata.csv),
+               release_date ('YYYY-MM-DD')
+               release_month and the track records of the director and of the
+               company are derived here, against the catalogue saved with the model
+    :return: DataFrame aligned on df: prediction (class label of New_status), probability (of the second class)
+    '''
+    estimator, pipeline, meta = load(model_id, name, path=path)
+    features = model_features(df, load_catalogue(meta['id'], path))
+    X = model_matrix(pipeline, pipeline.transform(features), meta['matrix'])
+    if hasattr(estimator, 'predict_proba'):
+        proba = estimator.predict_proba(X)
+        predicted = estimator.classes_[proba.argmax(axis=1)]
+        probability = proba[:, 1]
+    else:
+        predicted = estimator.predict(X)
+        probability = np.full(len(df), np.nan)
+    return pd.DataFrame({'prediction': pipeline.label_encoder_.inverse_transform(predicted),
+                         'probability': probability}, index=df.index)
+
+
+if __name__ == '__main__':
+    # python registry.py new_movies.csv [model id], writes new_movies_scored.csv
+    input_path = sys.argv[1]
+    scores = score_batch(pd.read_csv(input_path), model_id=sys.argv[2] if len(sys.argv) > 2 else None)
+    scores.to_csv(os.path.splitext(input_path)[0] + '_scored.csv')
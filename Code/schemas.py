@@ -0,0 +1,70 @@
+import csv
+
+#::------------------------------------------------------------------------
+# Read schemas of the raw source files
+# Every loader reads through read_kwargs(SCHEMA) so that only the used
+# columns are parsed, with their final dtypes, instead of letting pandas
+# infer types over the whole file and loading columns that are dropped later.
+#::------------------------------------------------------------------------
+
+# movies_metadata.csv (Kaggle)
+# budget and popularity hold a few corrupted rows (image paths, text), they
+# are read as strings and made numeric in etl.clean_movies
+MOVIES = {
+    'usecols': ['budget', 'genres', 'imdb_id', 'original_language', 'popularity', 'production_companies',
+                'release_date', 'revenue', 'runtime', 'title', 'vote_average', 'vote_count'],
+    'dtype': {
+        'budget': str,
+        'genres': str,
+        'imdb_id': str,
+        'original_language': 'category',
+        'popularity': str,
+        'production_companies': str,
+        'release_date': str,
+        'revenue': 'float64',
+        'runtime': 'float64',
+        'title': str,
+        'vote_average': 'float64',
+        'vote_count': 'float64',
+    },
+}
+
+# IMDb dumps: tab separated, no quoting, '\N' for missing values.
+# Only '\N' is a missing marker, a person called "NA" is a name
+IMDB_OPTIONS = {
+    'sep': '\t',
+    'quoting': csv.QUOTE_NONE,
+    'na_values': ['\\N'],
+    'keep_default_na': False,
+}
+
+TITLE_CREW = dict(IMDB_OPTIONS, **{
+    'usecols': ['tconst', 'directors'],
+    'dtype': {'tconst': str, 'directors': str},
+})
+
+NAME_BASICS = dict(IMDB_OPTIONS, **{
+    'usecols': ['nconst', 'primaryName'],
+    'dtype': {'nconst': str, 'primaryName': str},
+})
+
+TITLE_RATINGS = dict(IMDB_OPTIONS, **{
+    'usecols': ['tconst', 'averageRating', 'numVotes'],
+    'dtype': {'tconst': str, 'averageRating': 'float64', 'numVotes': 'int32'},
+})
+
+TITLE_YEAR = dict(IMDB_OPTIONS, **{
+    'usecols': ['tconst', 'startYear'],
+    'dtype': {'tconst': str, 'startYear': 'Int16'},
+})
+
+
+def read_kwargs(schema):
+    #::--------------------------------------------------------
+    # Keyword arguments for pd.read_csv, a copy so that callers
+    # can add their own options
+    #::--------------------------------------------------------
+    kwargs = dict(schema)
+    kwargs['usecols'] = list(schema['usecols'])
+    kwargs['dtype'] = dict(schema['dtype'])
+    return kwargs
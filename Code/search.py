@@ -0,0 +1,211 @@
+import json
+import math
+import os
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import ParameterGrid, ParameterSampler, StratifiedKFold, train_test_split
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVC
+from sklearn.tree import DecisionTreeClassifier
+
+import boosting
+import compact
+import etl
+import history
+import model_zoo
+import preprocessing
+
+#::------------------------------------------------------------------------
+# Hyperparameter search by successive halving
+#       python search.py
+# Every model of SPACES gets N_CANDIDATES configurations drawn from its
+# grid. They are all cross validated on a small sample of the training rows
+# of each fold, the best 1/ETA go on to a sample ETA times larger, and so on
+# until the last few run on the full folds. Each round fits its
+# (configuration, fold) pairs in parallel, like model_zoo.py.
+# The preprocessing of a fold (preprocessing.py, fitted on the training part
+# of the fold) does not depend on the configuration: the fold matrices are
+# built once, before the search, and shared by every fit.
+# The best configuration of every model goes to BEST_PARAMS_FILE, the
+# modeling section and the GUI read it with load_best_params.
+# Only the training rows of Project_Code.py (same split) are searched on.
+#::------------------------------------------------------------------------
+
+SEED = 100
+N_FOLDS = 5
+N_CANDIDATES = 27
+# 1/ETA of the configurations survive a round, on ETA times more rows
+ETA = 3
+# training rows per fold of the first round, at least
+MIN_ROWS = 100
+
+# name in the results table of Project_Code.py -> (estimator with the fixed parameters, model_zoo matrix, grid)
+SPACES = {
+    'DT Gini': (DecisionTreeClassifier(criterion='gini', random_state=SEED), 'sparse',
+                {'max_depth': [None, 3, 4, 6, 8, 12, 16], 'min_samples_leaf': [1, 2, 5, 10, 20, 50]}),
+    'DT Entropy': (DecisionTreeClassifier(criterion='entropy', random_state=SEED), 'sparse',
+                   {'max_depth': [None, 3, 4, 6, 8, 12, 16], 'min_samples_leaf': [1, 2, 5, 10, 20, 50]}),
+    'RF': (RandomForestClassifier(random_state=SEED), 'sparse',
+           {'n_estimators': [100, 200, 400], 'max_depth': [None, 8, 16], 'min_samples_leaf': [1, 2, 5],
+            'max_features': ['sqrt', 0.3]}),
+    'SVM': (SVC(kernel='linear'), 'sparse', {'C': [0.01, 0.1, 1, 3]}),
+    'KNN': (KNeighborsClassifier(), 'standardized',
+            {'n_neighbors': [3, 5, 9, 15, 25, 45], 'weights': ['uniform', 'distance']}),
+    'HGB': (boosting.hist_gradient_boosting(None, random_state=SEED), 'native',
+            {'learning_rate': [0.03, 0.05, 0.1], 'max_leaf_nodes': [7, 15, 31], 'min_samples_leaf': [10, 20, 50],
+             'l2_regularization': [0.0, 1.0, 10.0]}),
+}
+
+BEST_PARAMS_FILE = os.path.join(preprocessing.MODEL_DIR, 'best_params.json')
+
+
+def build_folds(df, n_folds=N_FOLDS, encoding=preprocessing.ENCODING, random_state=SEED):
+    '''
+    Preprocessed matrices of every fold, built once for the whole search
+    :param df: training rows, preprocessing.FEATURES and New_status
+    :return: list of dicts with the (train, validation) matrix pairs of
+             'sparse', 'standardized' and 'native', y_train, y_val, the
+             categorical mask of the native matrix and order, a random
+             permutation of the training rows (the samples of the rounds)
+    '''
+    y = df[preprocessing.TARGET]
+    folds = []
+    rng = np.random.RandomState(random_state)
+    for train, val in StratifiedKFold(n_folds, shuffle=True, random_state=random_state).split(df, y):
+        pipeline = preprocessing.make_pipeline(encoding)
+        X_train = pipeline.fit_transform(df.iloc[train][preprocessing.FEATURES], y.iloc[train])
+        X_val = pipeline.transform(df.iloc[val][preprocessing.FEATURES])
+        scaler = StandardScaler(with_mean=False).fit(X_train)
+        native_train, categorical = boosting.native_matrix(pipeline, X_train)
+        native_val, _ = boosting.native_matrix(pipeline, X_val)
+        folds.append({'sparse': (X_train, X_val),
+                      'standardized': (scaler.transform(X_train), scaler.transform(X_val)),
+                      'native': (native_train, native_val),
+                      'categorical': categorical,
+                      'y_train': pipeline.transform_target(y.iloc[train]),
+                      'y_val': pipeline.transform_target(y.iloc[val]),
+                      'order': rng.permutation(len(train))})
+    return folds
+
+
+def _evaluate(estimator, params, matrix, fold, rows):
+    #::--------------------------------------------------------
+    # validation AUC of one configuration on one fold, trained on
+    # the first rows of the fold's permutation of its training rows
+    #::--------------------------------------------------------
+    X_train, X_val = fold[matrix]
+    estimator = clone(estimator).set_params(**params)
+    if matrix == 'native':
+        estimator.set_params(categorical_features=fold['categorical'])
+    sample = fold['order'][:rows]
+    estimator.fit(X_train[sample], fold['y_train'][sample])
+    return roc_auc_score(fold['y_val'], model_zoo._score(estimator, X_val))
+
+
+def _rounds(n_candidates, n_rows, eta, min_rows):
+    # training rows per fold of every round, the last one uses them all
+    n_rounds = 1 + int(min(math.log(n_candidates, eta), math.log(max(n_rows / min_rows, 1), eta)))
+    return [int(n_rows * eta ** (r - n_rounds + 1)) for r in range(n_rounds)]
+
+
+def successive_halving(name, folds, n_candidates=N_CANDIDATES, eta=ETA, min_rows=MIN_ROWS, n_jobs=-1,
+                       random_state=SEED):
+    '''
+    Searches the grid of SPACES[name] on the cached folds
+    :return: dict with the best params, its mean validation roc_auc, and
+             the number of configurations and rows of every round
+    '''
+    estimator, matrix, grid = SPACES[name]
+    n_grid = len(ParameterGrid(grid))
+    if n_grid <= n_candidates:
+        candidates = list(ParameterGrid(grid))
+    else:
+        candidates = list(ParameterSampler(grid, n_candidates, random_state=random_state))
+
+    n_rows = min(len(fold['order']) for fold in folds)
+    rounds = []
+    for rows in _rounds(len(candidates), n_rows, eta, min_rows):
+        scores = Parallel(n_jobs=n_jobs, max_nbytes=model_zoo.MAX_NBYTES)(
+            delayed(_evaluate)(estimator, params, matrix, fold, rows) for params in candidates for fold in folds)
+        scores = np.asarray(scores).reshape(len(candidates), len(folds)).mean(axis=1)
+        rounds.append({'candidates': len(candidates), 'rows': rows})
+        # best first, the survivors of the round
+        ranking = np.argsort(-scores, kind='mergesort')
+        best_score = scores[ranking[0]]
+        candidates = [candidates[i] for i in ranking[:max(1, math.ceil(len(candidates) / eta))]]
+    return {'params': candidates[0], 'roc_auc': float(best_score), 'rounds': rounds}
+
+
+def run_search(df, names=None, n_jobs=-1, path=BEST_PARAMS_FILE, verbose=True):
+    '''
+    Successive halving of every model of names (all of SPACES by default)
+    on df, the best configurations are saved to path
+    :param df: training rows, preprocessing.FEATURES and New_status
+    :return: dict name -> result of successive_halving
+    '''
+    folds = build_folds(df)
+    best = {}
+    for name in names or list(SPACES):
+        best[name] = successive_halving(name, folds, n_jobs=n_jobs)
+        if verbose:
+            print('%-10s roc_auc %.4f  %s' % (name, best[name]['roc_auc'], best[name]['params']))
+    save_best_params(best, path)
+    return best
+
+
+def save_best_params(best, path=BEST_PARAMS_FILE):
+    '''
+    Writes the search results, merged into those already saved for other models
+    :return: path
+    '''
+    saved = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            saved = json.load(f)
+    saved.update(best)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(saved, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_best_params(path=BEST_PARAMS_FILE):
+    '''
+    :return: dict name -> best params, empty when the search never ran
+    '''
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {name: result['params'] for name, result in json.load(f).items()}
+
+
+def tuned(name, estimator, best_params):
+    '''
+    estimator with the searched parameters of the model name, unchanged when there are none
+    :param best_params: see load_best_params
+    '''
+    return estimator.set_params(**best_params.get(name, {}))
+
+
+def training_rows(df, seed=SEED):
+    # the training rows of the split of Project_Code.py
+    train_rows, _ = train_test_split(np.arange(len(df)), test_size=0.3, random_state=seed, stratify=df[preprocessing.TARGET])
+    return df.iloc[train_rows]
+
+
+def load_modeling_frame():
+    # merged_inner as the modeling section of Project_Code.py builds it: cached ETL, compact dtypes, track records
+    merged_inner = compact.compact_frame(etl.load_merged_inner(incremental=True), verbose=False)
+    merged_inner['popularity'] = merged_inner['popularity'].astype(float).fillna(0.0)
+    return history.add_history_features(merged_inner)
+
+
+if __name__ == '__main__':
+    run_search(training_rows(load_modeling_frame()))
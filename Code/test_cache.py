@@ -0,0 +1,23 @@
+import pandas as pd
+
+import cache
+import dates
+
+
+def test_round_trip_keeps_dtypes(tmp_path):
+    # release_month keeps its fixed int categories 1..12, not the float months present
+    df = pd.DataFrame({'release_month': pd.Series([10, 12, None], dtype='Int8').astype(dates.MONTHS),
+                       'New_status': pd.Series([0.0, 1.0, 1.0]).astype('category'),
+                       'Genre': pd.Categorical(['Drama', 'Comedy', 'Drama'], categories=['Drama', 'Comedy', 'War'],
+                                               ordered=True),
+                       'release_date': pd.to_datetime(['2001-10-01', '2002-12-24', None]),
+                       'budget': [1.0, 2.0, 3.0],
+                       'Director': pd.Series(['a', float('nan'), 'c'], dtype=object)})
+    cache.save_frame(df, 'frame', str(tmp_path))
+    loaded = cache.load_frame('frame', str(tmp_path))
+    pd.testing.assert_series_equal(loaded.dtypes, df.dtypes)
+    pd.testing.assert_frame_equal(loaded, df)
+
+
+def test_missing_key(tmp_path):
+    assert cache.load_frame('missing', str(tmp_path)) is None
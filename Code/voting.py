@@ -0,0 +1,88 @@
+import numpy as np
+
+#::------------------------------------------------------------------------
+# Voting ensemble of already fitted models
+# The predictions (or probabilities) of the members are stacked into one
+# array, (members, rows) or (members, rows, classes), and the vote of every
+# row is a single numpy reduction over the members axis:
+#       hard : weighted count of the predicted classes, np.bincount
+#       soft : weighted mean of the class probabilities, np.tensordot
+# Nothing is refitted, and any number of members and rows works the same.
+#::------------------------------------------------------------------------
+
+VOTING = ('hard', 'soft')
+
+
+def hard_vote(votes, n_classes, weights=None):
+    '''
+    Weighted vote shares of stacked class predictions
+    :param votes: int array (members, rows), class index predicted by every member
+    :param weights: one weight per member, equal weights by default
+    :return: array (rows, classes), the vote shares of every row (sum 1)
+    '''
+    votes = np.asarray(votes)
+    n_members, n_rows = votes.shape
+    weights = np.ones(n_members) if weights is None else np.asarray(weights, dtype=np.float64)
+    # one bin per (row, class) pair
+    pairs = np.arange(n_rows) * n_classes + votes
+    counts = np.bincount(pairs.ravel(), weights=np.repeat(weights, n_rows), minlength=n_rows * n_classes)
+    return counts.reshape(n_rows, n_classes) / weights.sum()
+
+
+def soft_vote(probabilities, weights=None):
+    '''
+    Weighted mean of stacked class probabilities
+    :param probabilities: array (members, rows, classes)
+    :param weights: one weight per member, equal weights by default
+    :return: array (rows, classes)
+    '''
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    weights = np.ones(len(probabilities)) if weights is None else np.asarray(weights, dtype=np.float64)
+    return np.tensordot(weights, probabilities, axes=1) / weights.sum()
+
+
+class VotingEnsemble:
+    '''
+    Hard or soft vote of fitted classifiers predicting on the same matrix
+    The class with the largest (weighted) share wins, ties go to the first
+    class of classes_. For the soft vote a member without predict_proba
+    (SVC without probability=True) gives probability 1 to its prediction.
+    :param members: fitted scikit-learn classifiers with the same classes_
+    :param voting: one of VOTING
+    :param weights: one weight per member, equal weights by default
+    '''
+
+    def __init__(self, members, voting='hard', weights=None):
+        if voting not in VOTING:
+            raise ValueError("voting must be one of %s, got %r" % (VOTING, voting))
+        if weights is not None and len(weights) != len(members):
+            raise ValueError("%d weights for %d members" % (len(weights), len(members)))
+        self.members = members
+        self.voting = voting
+        self.weights = weights
+        self.classes_ = members[0].classes_
+        for member in members[1:]:
+            if not np.array_equal(member.classes_, self.classes_):
+                raise ValueError("the members do not predict the same classes")
+
+    def _votes(self, X):
+        # (members, rows) class index predicted by every member
+        return np.searchsorted(self.classes_, np.stack([member.predict(X) for member in self.members]))
+
+    def _probabilities(self, X):
+        # (members, rows, classes), one-hot votes for the members without predict_proba
+        n_classes = len(self.classes_)
+        return np.stack([member.predict_proba(X) if hasattr(member, 'predict_proba')
+                         else np.eye(n_classes)[np.searchsorted(self.classes_, member.predict(X))]
+                         for member in self.members])
+
+    def predict_proba(self, X):
+        '''
+        :return: array (rows, classes), vote shares (hard) or mean probabilities (soft)
+        '''
+        if self.voting == 'hard':
+            return hard_vote(self._votes(X), len(self.classes_), self.weights)
+        return soft_vote(self._probabilities(X), self.weights)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
@@ -25,17 +25,19 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import roc_auc_score
 from sklearn.metrics import roc_curve, auc
 from sklearn.preprocessing import label_binarize
+import os
+import sys
 
 #set seed
 seed = 100
 
 
 #Extracting Month from release date
-merged_inner['release_date_temp'] = pd.to_datetime(merged_inner['release_date'],format='%Y-%m-%d', errors='coerce')  #Converting string to datetime
-merged_inner['release_month'] = pd.to_datetime(merged_inner['release_date_temp']).dt.month #extracting month from datetime(Releasedate) column
-#df_cleaned['release_month'] = pd.to_numeric(df_cleaned['release_month'],errors='coerce') #converting float to int
-merged_inner['release_month'] = merged_inner['release_month'].astype('category') #changing type from num to category
-merged_inner = merged_inner.drop(['release_date_temp'], axis=1) #Deleting temp column
+# shared date stage of the project code: parses every distinct date once and adds release_month (category),
+# quarter, weekday, decade and holiday_window from its calendar table
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'Code'))
+import dates
+merged_inner = dates.add_date_features(merged_inner)
 
 # Removing Duplicates
 merged_inner.drop_duplicates(inplace = True)     # no duplicates found